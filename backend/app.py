@@ -1,36 +1,184 @@
 from flask import Flask
 from dotenv import load_dotenv
+from importlib import import_module
+import click
+import logging
 import os
+import subprocess
+import sys
+import weakref
 from flask_cors import CORS
-from extensions import db, jwt, migrate
-from models import Video
+from extensions import db, init_migrate, jwt, metrics, password_hasher, rate_limiter, response_cache
+from serializers import JSONProvider
+from database import REPLICA_BIND, engine_options
+from services import catalog, idempotency, progress
 
-from routes.auth import auth_bp
-from routes.category import category_bp
-from routes.course import course_bp
-from routes.video import video_bp
+# Blueprints are imported by create_app, so importing this module stays
+# cheap and an app can be built with only the blueprints it needs.
+BLUEPRINTS = [
+    'routes.auth:auth_bp',
+    'routes.category:category_bp',
+    'routes.course:course_bp',
+    'routes.search:search_bp',
+    'routes.video:video_bp'
+]
 
-load_dotenv()
+def load_config():
+    load_dotenv()
 
-app = Flask(__name__)
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL'),
+        'DATABASE_REPLICA_URL': os.environ.get('DATABASE_REPLICA_URL'),
+        'JWT_SECRET_KEY': os.environ.get('SECRET_KEY'),
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'DB_POOL_RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'DB_POOL_PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        'DB_STATEMENT_TIMEOUT': int(os.environ.get('DB_STATEMENT_TIMEOUT', 0)),
+        'DB_MIGRATIONS': os.environ.get('DB_MIGRATIONS', '1') == '1',
+        'CACHE_TTL': int(os.environ.get('CACHE_TTL', 60)),
+        'AUTH_CLAIMS_MAX_AGE': int(os.environ.get('AUTH_CLAIMS_MAX_AGE', 300)),
+        'AUTH_IDENTITY_TTL': int(os.environ.get('AUTH_IDENTITY_TTL', 30)),
+        'VIDEO_IMPORT_BATCH_SIZE': int(os.environ.get('VIDEO_IMPORT_BATCH_SIZE', 500)),
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1))),
+        'PASSWORD_HASH_QUEUE': int(os.environ.get('PASSWORD_HASH_QUEUE', 16)),
+        'PASSWORD_HASH_TIMEOUT': float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5)),
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+        'METRICS_N_PLUS_ONE': int(os.environ.get('METRICS_N_PLUS_ONE', 10)),
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'INFO'),
+        'LOG_SAMPLE_RATE': float(os.environ.get('LOG_SAMPLE_RATE', 0.1)),
+        'IDEMPOTENCY_TTL': int(os.environ.get('IDEMPOTENCY_TTL', 86400)),
+        'IDEMPOTENCY_LOCK_TIMEOUT': int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 30)),
+        'IDEMPOTENCY_CACHE_SIZE': int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 4096)),
+        'CATALOG_MAX_AGE': int(os.environ.get('CATALOG_MAX_AGE', 60)),
+        'PROGRESS_FLUSH_INTERVAL': float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 5)),
+        'PROGRESS_FLUSH_SIZE': int(os.environ.get('PROGRESS_FLUSH_SIZE', 1000)),
+        'RATELIMIT_ENABLED': os.environ.get('RATELIMIT_ENABLED', '1') == '1',
+        'RATELIMIT_LIMITS': {
+            'auth': os.environ.get('RATELIMIT_AUTH', '10/minute'),
+            'category': os.environ.get('RATELIMIT_CATEGORY', '30/minute'),
+            'course': os.environ.get('RATELIMIT_COURSE', '60/minute'),
+            'video': os.environ.get('RATELIMIT_VIDEO', '60/minute')
+        },
+        'BLUEPRINTS': BLUEPRINTS
+    }
 
-CORS(app)
+def create_app(config=None):
+    app = Flask(__name__)
+    app.json = JSONProvider(app)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
-app.config['JWT_SECRET_KEY'] = os.environ['SECRET_KEY']
+    CORS(app, expose_headers=['X-Next-Cursor', 'X-Total-Count', 'Idempotent-Replayed'])
 
-db.init_app(app)
-jwt.init_app(app)
-migrate.init_app(app, db)
+    app.config.update(load_config())
+    app.config.update(config or {})
 
-app.register_blueprint(auth_bp)
-app.register_blueprint(category_bp)
-app.register_blueprint(course_bp)
-app.register_blueprint(video_bp)
+    # LOG_LEVEL applies to the app's own loggers, libraries stay at WARNING
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    for name in ('metrics', 'routes', 'services'):
+        logging.getLogger(name).setLevel(app.config['LOG_LEVEL'])
 
-@app.route('/')
-def initial():
-    print('Welcome the Dev Pereira Courses')
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    if not database_url:
+        raise RuntimeError('DATABASE_URL is not set')
+
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url, app.config)
+
+    replica_url = app.config['DATABASE_REPLICA_URL']
+    if replica_url and REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        app.config['SQLALCHEMY_BINDS'] = {
+            **app.config.get('SQLALCHEMY_BINDS', {}),
+            REPLICA_BIND: {'url': replica_url, **engine_options(replica_url, app.config)}
+        }
+
+    db.init_app(app)
+    jwt.init_app(app)
+    if app.config['DB_MIGRATIONS']:
+        init_migrate(app)
+    response_cache.init_app(app)
+    password_hasher.init_app(app)
+    metrics.init_app(app)
+    rate_limiter.init_app(app)
+    progress.buffer.init_app(app)
+    catalog.store.init_app(app)
+    idempotency.store.init_app(app)
+
+    for path in app.config['BLUEPRINTS']:
+        module, name = path.split(':')
+        app.register_blueprint(getattr(import_module(module), name))
+
+    apps.add(app)
+    app.cli.add_command(importtime_command)
+    app.cli.add_command(perf_command)
+    app.cli.add_command(catalog.catalog_cli)
+
+    @app.route('/')
+    def initial():
+        print('Welcome the Dev Pereira Courses')
+
+    return app
+
+# With gunicorn --preload the app is built in the master process. Forked
+# workers must not reuse the master's pooled connections, so each child
+# drops them (without closing the parent's sockets) and opens its own. The
+# hook is registered once and covers every app still alive in the process.
+apps = weakref.WeakSet()
+
+def dispose_engines_after_fork():
+    for app in list(apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+@click.command('importtime', help='Show which imports dominate the cold start of create_app().')
+@click.option('--top', default=20, help='Number of modules to show.')
+def importtime_command(top):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        timings.append((int(cumulative_us), int(self_us), module.rstrip()))
+
+    if result.returncode != 0:
+        click.echo(result.stderr, err=True)
+        raise SystemExit(result.returncode)
+
+    total = sum(self_us for _, self_us, _ in timings)
+    click.echo(f'{"cumulative [ms]":>16} {"self [ms]":>10}  module')
+    for cumulative_us, self_us, module in sorted(timings, reverse=True)[:top]:
+        click.echo(f'{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {module}')
+    click.echo(f'{len(timings)} modules imported in {total / 1000:.1f} ms')
+
+class LazyGroup(click.Group):
+    # Stands in for a command group kept in another module, which is only
+    # imported once one of its commands is looked up, so serving workers
+    # never load the tooling behind it.
+    def __init__(self, name, import_path, **kwargs):
+        super().__init__(name, **kwargs)
+        self.import_path = import_path
+
+    def load(self):
+        module, name = self.import_path.split(':')
+        return getattr(import_module(module), name)
+
+    def list_commands(self, ctx):
+        return self.load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self.load().get_command(ctx, name)
+
+perf_command = LazyGroup('perf', 'perf:perf_cli', help='Seed large datasets and load-test the routes.')
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,227 @@
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import jwt
+from werkzeug.http import http_date
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import load_config
+from routes.course import COURSES_MAX_PAGE_SIZE, COURSES_PAGE_SIZE
+from serializers import as_dicts, completion, course_details, course_page, course_videos, user_enrollment_count, user_enrollments, video_details
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Async, read-only variant of the catalog, course detail, video and
+# my-courses endpoints. It shares the models and projections with the
+# Flask app and runs next to it under any ASGI server:
+#
+#     pip install -r requirements-asgi.txt
+#     uvicorn --factory asgi:create_asgi_app
+#
+# The async driver (asyncpg for Postgres, aiosqlite for SQLite) is picked
+# from DATABASE_URL unless ASYNC_DATABASE_URL is set.
+
+ASYNC_DRIVERS = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', b'X-Next-Cursor, X-Total-Count')
+]
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        super().__init__(status)
+        self.status = status
+        self.body = body
+
+def async_url(url):
+    scheme, rest = url.split('://', 1)
+    return ASYNC_DRIVERS.get(scheme.split('+')[0], scheme) + '://' + rest
+
+def async_engine_options(url, config):
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE']
+    }
+
+    if not url.startswith('sqlite'):
+        options['pool_size'] = config['DB_POOL_SIZE']
+        options['max_overflow'] = config['DB_MAX_OVERFLOW']
+
+    if url.startswith('postgresql+asyncpg') and config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+
+    return options
+
+def int_param(params, name, default=None):
+    try:
+        return int(params[name][0])
+    except (KeyError, ValueError):
+        return default
+
+def default(value):
+    # dates are sent in the same format as Flask's JSON provider
+    if isinstance(value, datetime):
+        return http_date(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(body):
+    if orjson:
+        options = orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE | orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(body, default=default, option=options)
+    return (json.dumps(body, default=default, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+class AsyncReadApp:
+    def __init__(self, config):
+        self.config = config
+        url = config.get('ASYNC_DATABASE_URL') or async_url(config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(url, **async_engine_options(url, config))
+        self.routes = [
+            (re.compile(r'/courses/?'), self.get_courses, False),
+            (re.compile(r'/courses/(\d+)'), self.get_details_course, True),
+            (re.compile(r'/videos/(\d+)'), self.view_video, True),
+            (re.compile(r'/my-courses'), self.get_my_courses, True)
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['method'] == 'OPTIONS':
+            return await self.send(send, 204, None, [
+                (b'access-control-allow-headers', b'Authorization, Content-Type'),
+                (b'access-control-allow-methods', b'GET')
+            ])
+
+        headers = []
+        try:
+            handler, args, protected = self.match(scope['path'])
+
+            if scope['method'] != 'GET':
+                raise HTTPError(405, {'message': 'Method not allowed'})
+
+            params = parse_qs(scope['query_string'].decode())
+            user_id = self.authenticate(scope) if protected else None
+            status, body, headers = 200, *await handler(params, user_id, *args)
+        except HTTPError as error:
+            status, body = error.status, error.body
+
+        await self.send(send, status, body, headers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def send(self, send, status, body, headers):
+        content = b'' if body is None else dumps(body)
+        headers = CORS_HEADERS + headers + [(b'content-length', str(len(content)).encode())]
+        if body is not None:
+            headers.append((b'content-type', b'application/json'))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    def match(self, path):
+        for pattern, handler, protected in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                return handler, [int(arg) for arg in match.groups()], protected
+        raise HTTPError(404, {'message': 'Not found'})
+
+    def authenticate(self, scope):
+        # Same checks as flask_jwt_extended for access tokens; the role and
+        # plan claims are not needed by any read endpoint.
+        authorization = dict(scope['headers']).get(b'authorization', b'').decode()
+        if not authorization.startswith('Bearer '):
+            raise HTTPError(401, {'msg': 'Missing Authorization Header'})
+
+        try:
+            payload = jwt.decode(authorization[len('Bearer '):], self.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            raise HTTPError(401, {'msg': 'Token has expired'})
+        except jwt.InvalidTokenError as error:
+            raise HTTPError(422, {'msg': str(error)})
+
+        if payload.get('type') != 'access':
+            raise HTTPError(422, {'msg': 'Only non-refresh tokens are allowed'})
+        return int(payload['sub'])
+
+    async def get_courses(self, params, user_id):
+        limit = int_param(params, 'limit', COURSES_PAGE_SIZE)
+        is_premium = params.get('is_premium', [None])[0]
+
+        if limit < 1 or limit > COURSES_MAX_PAGE_SIZE:
+            raise HTTPError(400, {'message': 'Invalid limit'})
+
+        if is_premium is not None:
+            if is_premium.lower() in ('1', 'true'):
+                is_premium = True
+            elif is_premium.lower() in ('0', 'false'):
+                is_premium = False
+            else:
+                raise HTTPError(400, {'message': 'Invalid is_premium'})
+
+        query = course_page(int_param(params, 'cursor'), int_param(params, 'category_id'), is_premium)
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(query.limit(limit + 1))).all()
+
+        courses_list = as_dicts(rows[:limit])
+        headers = []
+        if len(rows) > limit:
+            headers.append((b'x-next-cursor', str(courses_list[-1]['id']).encode()))
+        return courses_list, headers
+
+    async def get_details_course(self, params, user_id, course_id):
+        async with self.engine.connect() as connection:
+            course = (await connection.execute(course_details(course_id, user_id))).first()
+
+            if not course:
+                raise HTTPError(404, {'message': 'Course not found'})
+
+            details = course._asdict()
+            details['is_enrolled'] = bool(details['is_enrolled'])
+            details['completion'] = completion(details['completed_videos'], details['video_count'])
+            details['videos'] = as_dicts(await connection.execute(course_videos(course_id)))
+        return details, []
+
+    async def view_video(self, params, user_id, video_id):
+        async with self.engine.connect() as connection:
+            video = (await connection.execute(video_details(video_id))).first()
+
+        if not video:
+            raise HTTPError(404, {'message': 'Video not found'})
+        return video._asdict(), []
+
+    async def get_my_courses(self, params, user_id):
+        limit = int_param(params, 'limit', COURSES_PAGE_SIZE)
+
+        if limit < 1 or limit > COURSES_MAX_PAGE_SIZE:
+            raise HTTPError(400, {'message': 'Invalid limit'})
+
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(user_enrollments(user_id, int_param(params, 'cursor')).limit(limit + 1))).all()
+            total = (await connection.execute(user_enrollment_count(user_id))).scalar() or 0
+
+        courses_list = as_dicts(rows[:limit])
+        headers = [(b'x-total-count', str(total).encode())]
+        if len(rows) > limit:
+            headers.append((b'x-next-cursor', str(courses_list[-1]['id']).encode()))
+        return courses_list, headers
+
+def create_asgi_app(config=None):
+    return AsyncReadApp({**load_config(), **(config or {})})
@@ -0,0 +1,53 @@
+import time
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, jsonify
+from flask_jwt_extended import create_access_token, current_user, jwt_required
+
+from cache import LRUCache
+from extensions import db, jwt
+from models import User
+
+Identity = namedtuple('Identity', ['id', 'role', 'plan_type'])
+
+identity_cache = LRUCache(maxsize=4096)
+
+def create_user_token(user):
+    return create_access_token(identity=str(user.id), additional_claims={
+        'role': user.role,
+        'plan_type': user.plan_type
+    })
+
+# Claims are trusted for AUTH_CLAIMS_MAX_AGE seconds after the token was
+# issued; older tokens fall back to the database through a short-lived
+# cache, so a revoked role stops working after at most
+# AUTH_CLAIMS_MAX_AGE + AUTH_IDENTITY_TTL seconds.
+@jwt.user_lookup_loader
+def load_identity(jwt_header, jwt_data):
+    user_id = int(jwt_data['sub'])
+
+    if 'role' in jwt_data and time.time() - jwt_data['iat'] <= current_app.config['AUTH_CLAIMS_MAX_AGE']:
+        return Identity(user_id, jwt_data['role'], jwt_data.get('plan_type'))
+
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        row = db.session.execute(db.select(User.id, User.role, User.plan_type).where(User.id == user_id)).first()
+        if not row:
+            return None
+
+        identity = Identity(*row)
+        identity_cache.set(user_id, identity, ttl=current_app.config['AUTH_IDENTITY_TTL'])
+    return identity
+
+def forget_identity(user_id):
+    identity_cache.delete(int(user_id))
+
+def admin_required(fn):
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if current_user.role != 'admin':
+            return jsonify({'message': 'Without permission'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
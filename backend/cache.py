@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+
+def new_token():
+    return os.urandom(8).hex()
+
+
+class CacheBackend:
+    # Shared backends (redis, memcached...) only need to implement get/set.
+    # A ttl of 0 means the key never expires.
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class ResponseCache:
+    # Entries hold the encoded JSON body plus a token for every tag they
+    # depend on. Invalidating a tag replaces its token, so only the entries
+    # that recorded the old token are dropped. A tag whose token was evicted
+    # gets a fresh one, which also never matches an older entry.
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', None)
+        app.config.setdefault('CACHE_MAXSIZE', 1024)
+        app.config.setdefault('CACHE_TTL', 60)
+
+        self.ttl = app.config['CACHE_TTL']
+        self.backend = app.config['CACHE_BACKEND'] or LRUCache(app.config['CACHE_MAXSIZE'], self.ttl)
+        app.extensions['response_cache'] = self
+
+    def _tag_tokens(self, tags):
+        keys = ['tag:' + tag for tag in tags]
+        tokens = self.backend.get_many(keys)
+
+        for index, token in enumerate(tokens):
+            if token is None:
+                tokens[index] = new_token()
+                self.backend.set(keys[index], tokens[index], ttl=0)
+        return dict(zip(tags, tokens))
+
+    def respond(self, key, build):
+        key = 'response:' + key
+        entry = self.backend.get(key)
+
+        if entry is not None and self._tag_tokens(list(entry[3])) != entry[3]:
+            entry = None
+
+        if entry is None:
+            generation = self.backend.get('generation')
+            response, status, tags = build()
+
+            if status != 200:
+                return response, status
+
+            body = response.get_data()
+            headers = {name: value for name, value in response.headers.items() if name.startswith('X-')}
+            entry = (body, headers, hashlib.sha1(body).hexdigest(), self._tag_tokens(list(tags)))
+
+            # A write that landed while the body was being built may not be
+            # reflected in it, so only store it if nothing was invalidated.
+            if self.backend.get('generation') == generation:
+                self.backend.set(key, entry, ttl=self.ttl)
+
+        body, headers, etag, _ = entry
+        response = Response(body, headers=headers, mimetype='application/json')
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set('tag:' + tag, new_token(), ttl=0)
+        self.backend.set('generation', new_token(), ttl=0)
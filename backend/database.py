@@ -0,0 +1,49 @@
+from functools import wraps
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+
+def engine_options(url, config):
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE']
+    }
+
+    if not url.startswith('sqlite'):
+        options['pool_size'] = config['DB_POOL_SIZE']
+        options['max_overflow'] = config['DB_MAX_OVERFLOW']
+
+    return options
+
+class RoutingSession(Session):
+    # Reads inside a @use_replica view go to the replica bind when one is
+    # configured; flushes and everything else stay on the primary.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and request.environ.get('use_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+# The timeout only bounds statements run while serving a request. The same
+# engine runs migrations and the flask CLI commands, which may take longer.
+@event.listens_for(RoutingSession, 'after_begin')
+def apply_statement_timeout(session, transaction, connection):
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+
+    timeout = current_app.config['DB_STATEMENT_TIMEOUT']
+    if timeout:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+def use_replica(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Kept for the whole request so streamed responses, which query
+        # after the view returns, read from the replica too.
+        request.environ['use_replica'] = True
+        return fn(*args, **kwargs)
+    return wrapper
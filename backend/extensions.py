@@ -1,7 +1,21 @@
 from flask_jwt_extended import JWTManager
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from cache import ResponseCache
+from database import RoutingSession
+from metrics import Metrics
+from ratelimit import RateLimiter
+from services.passwords import PasswordHasher
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
-migrate = Migrate()
\ No newline at end of file
+response_cache = ResponseCache()
+password_hasher = PasswordHasher()
+rate_limiter = RateLimiter()
+metrics = Metrics()
+
+def init_migrate(app):
+    # alembic is only needed by the 'flask db' commands and is one of the
+    # slowest imports, so serving workers can skip it with DB_MIGRATIONS=0.
+    from flask_migrate import Migrate
+    from services.search import include_object
+    Migrate(app, db, include_object=include_object)
@@ -0,0 +1,153 @@
+import bisect
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import Response, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def log_event(logger, event, sample_rate=1, level=logging.INFO, **fields):
+    # One logfmt line per event. Events logged with sample_rate < 1 are only
+    # written for that fraction of calls; the rate goes into the line so
+    # counts can be scaled back up.
+    if sample_rate < 1:
+        if random.random() >= sample_rate:
+            return
+        fields['sample_rate'] = sample_rate
+
+    if logger.isEnabledFor(level):
+        logger.log(level, ' '.join([f'event={event}'] + [f'{name}={value}' for name, value in fields.items()]))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    # Numbers are kept per process; with several workers each one serves
+    # its own /metrics and the scraper adds them up.
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)
+        self.requests = Counter()
+        self.statements = Counter()
+        self.db_seconds = Counter()
+        self.n_plus_one = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_N_PLUS_ONE', 10)
+        app.extensions['metrics'] = self
+
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self.start_request)
+        app.after_request(self.record_status)
+        app.teardown_request(self.finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+
+    def start_request(self):
+        g.request_metrics = {'start': time.perf_counter(), 'status': 500, 'db_seconds': 0.0, 'statements': Counter()}
+
+    def record_status(self, response):
+        if 'request_metrics' in g:
+            g.request_metrics['status'] = response.status_code
+            g.request_metrics['streamed'] = response.is_streamed
+        return response
+
+    def finish_request(self, exc):
+        stats = g.get('request_metrics')
+        if stats is None:
+            return
+
+        # A stream_with_context response is torn down when the view returns
+        # and again once its body has been generated; it's the second one
+        # that covers the streamed queries.
+        if stats.pop('streamed', False):
+            return
+        g.pop('request_metrics')
+
+        duration = time.perf_counter() - stats['start']
+        endpoint = request.endpoint or 'none'
+        statements = stats['statements']
+        total = sum(statements.values())
+
+        repeated = [(sql, count) for sql, count in statements.items() if count > current_app.config['METRICS_N_PLUS_ONE']]
+        for sql, count in repeated:
+            log_event(log, 'n_plus_one', level=logging.WARNING, endpoint=endpoint, count=count, statement=repr(' '.join(sql.split())[:200]))
+
+        with self._lock:
+            self.latency[(endpoint, request.method)].observe(duration)
+            self.requests[(endpoint, request.method, stats['status'])] += 1
+            self.statements[endpoint] += total
+            self.db_seconds[endpoint] += stats['db_seconds']
+            self.n_plus_one[endpoint] += len(repeated)
+
+    def render(self):
+        lines = []
+
+        with self._lock:
+            lines += ['# HELP http_request_duration_seconds Request latency by endpoint.', '# TYPE http_request_duration_seconds histogram']
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+            lines += ['# HELP http_requests_total Requests by endpoint and status.', '# TYPE http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            for name, description, counter in (
+                ('db_statements_total', 'SQL statements run by endpoint.', self.statements),
+                ('db_duration_seconds_total', 'Time spent in SQL statements by endpoint.', self.db_seconds),
+                ('n_plus_one_total', 'Requests that repeated a statement more than METRICS_N_PLUS_ONE times.', self.n_plus_one)
+            ):
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+                lines += [f'{name}{{endpoint="{endpoint}"}} {value}' for endpoint, value in sorted(counter.items())]
+
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+# Statements are attributed to the request running on the current thread;
+# CLI commands and other work outside a request are not counted.
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+
+    stats = g.get('request_metrics') if has_app_context() else None
+    if stats is not None:
+        stats['statements'][statement] += 1
+        stats['db_seconds'] += duration
+
+def handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    if context.statement is not None and context.connection is not None and context.connection.info.get('query_start'):
+        context.connection.info['query_start'].pop()
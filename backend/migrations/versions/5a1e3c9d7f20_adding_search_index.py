@@ -0,0 +1,69 @@
+"""adding search index
+
+Revision ID: 5a1e3c9d7f20
+Revises: cdb58f294421
+Create Date: 2026-10-18 13:02:11.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1e3c9d7f20'
+down_revision = 'cdb58f294421'
+branch_labels = None
+depends_on = None
+
+# table: (title column, text column)
+SEARCH_COLUMNS = {
+    'course': ('title', 'description'),
+    'video': ('title', 'resume')
+}
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+
+    for table, (title, text) in SEARCH_COLUMNS.items():
+        if dialect == 'postgresql':
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce({text}, '')), 'B')) STORED"
+            )
+            op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+
+        elif dialect == 'sqlite':
+            op.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({title}, {text}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, {title}, {text}) VALUES (new.id, new.{title}, new.{text}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {title}, {text}) VALUES ('delete', old.id, old.{title}, old.{text}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF {title}, {text} ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {title}, {text}) VALUES ('delete', old.id, old.{title}, old.{text}); "
+                f"INSERT INTO {table}_fts(rowid, {title}, {text}) VALUES (new.id, new.{title}, new.{text}); END"
+            )
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+
+    for table in SEARCH_COLUMNS:
+        if dialect == 'postgresql':
+            op.drop_index(f'ix_{table}_search_vector', table_name=table)
+            op.drop_column(table, 'search_vector')
+
+        elif dialect == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE {table}_fts')
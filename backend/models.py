@@ -2,6 +2,9 @@ from extensions import db
 from datetime import datetime
 
 class User(db.Model):
+    # covers the teacher directory: WHERE role = 'admin' ORDER BY id, username
+    __table_args__ = (db.Index('ix_user_role_id_username', 'role', 'id', 'username'),)
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), nullable=False, unique=True)
@@ -9,33 +12,62 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     role = db.Column(db.String(5), default='aluno')
     plan_type = db.Column(db.String(20), default='free')
+    enrollment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False, unique=True)
     courses = db.relationship('Course', backref='category')
+    course_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     teacher = db.relationship('User', backref='created_courses')
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     videos = db.relationship('Video', backref='course', cascade='all, delete-orphan')
     is_premium = db.Column(db.Boolean, default=False)
+    video_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    enrollment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Video(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
     resume = db.Column(db.Text, nullable=True)
     url = db.Column(db.Text, nullable=False, unique=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
 class Enrollment(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='uq_enrollment_user_course'),
+        db.Index('ix_enrollment_user_id_id', 'user_id', 'id')
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User', backref='enrollments')
-    course = db.relationship('Course', backref='enrollments')
\ No newline at end of file
+    course = db.relationship('Course', backref='enrollments')
+
+class VideoProgress(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'video_id', name='uq_video_progress_user_video'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    video_id = db.Column(db.Integer, db.ForeignKey('video.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    # sha256 of the client, the endpoint and the Idempotency-Key header
+    key = db.Column(db.String(64), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # null while the first request is still running
+    status = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
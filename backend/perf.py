@@ -0,0 +1,617 @@
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html import escape
+from itertools import islice
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import click
+import sqlalchemy
+from flask.cli import AppGroup
+
+from authz import create_user_token
+from extensions import db, metrics, password_hasher
+from models import Category, Course, Enrollment, User, Video, VideoProgress
+from services import counters, progress
+from video_urls import EMBED_URL
+
+# Performance suite, meant to run against a throwaway local SQLite file:
+#
+#     export DATABASE_URL=sqlite:///perf.sqlite
+#     flask db upgrade
+#     flask perf seed --users 100000 --courses 10000 --videos 200000 --enrollments 1000000
+#     flask perf run --output before.json --html before.html
+#     ... change something ...
+#     flask perf run --output after.json
+#     flask perf compare before.json after.json
+#
+# 'run' writes to the database (signups, new courses, deletes...), so seed
+# a fresh file before runs that are going to be compared.
+#
+# Search at scale, on its own seeded file. The generated text only uses the
+# 30 WORDS, so every term matches most rows: this times the worst case,
+# where bm25 ranks hundreds of thousands of hits per query.
+#
+#     flask perf seed --users 10000 --courses 10000 --videos 1000000 --enrollments 100000
+#     flask perf run --scenario search.search_catalog --requests 20 --concurrency 1
+#
+# The same scenarios run under pytest-benchmark on a small seeded database:
+#
+#     pytest tests/test_perf.py --benchmark-autosave
+#     pytest tests/test_perf.py --benchmark-compare
+
+PERF_PASSWORD = 'perf-password'
+PERF_EMAIL = 'user{}@perf.local'
+
+WORDS = [
+    'python', 'java', 'javascript', 'react', 'flask', 'django', 'sql', 'postgres', 'docker', 'kubernetes',
+    'linux', 'git', 'redes', 'seguranca', 'dados', 'machine', 'learning', 'estatistica', 'algoritmos', 'web',
+    'api', 'testes', 'cloud', 'aws', 'design', 'mobile', 'android', 'kotlin', 'swift', 'excel'
+]
+
+perf_cli = AppGroup('perf', help='Seed large datasets and load-test the routes.')
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+def insert_rows(model, rows, batch_size):
+    started = time.perf_counter()
+    total = 0
+
+    for batch in batches(rows, batch_size):
+        db.session.execute(db.insert(model), batch)
+        total += len(batch)
+    db.session.commit()
+
+    click.echo(f'{model.__tablename__:>12}: {total} rows in {time.perf_counter() - started:.1f}s')
+
+def enrollment_rows(rng, users, courses, enrollments, created_at):
+    per_user, extra = divmod(enrollments, users)
+    for user_id in range(1, users + 1):
+        for course_id in rng.sample(range(1, courses + 1), per_user + (user_id <= extra)):
+            yield {'user_id': user_id, 'course_id': course_id, 'created_at': created_at}
+
+@perf_cli.command('seed', help='Fill an empty database with generated users, categories, courses, videos and enrollments.')
+@click.option('--users', default=1000, help='Users, teachers included.')
+@click.option('--teachers', default=50, help='Users with the admin role.')
+@click.option('--categories', default=20)
+@click.option('--courses', default=500)
+@click.option('--videos', default=5000)
+@click.option('--enrollments', default=20000)
+@click.option('--seed', default=1, help='Random seed, the same options always generate the same data.')
+@click.option('--batch-size', default=10000, help='Rows per INSERT.')
+def seed_command(users, teachers, categories, courses, videos, enrollments, seed, batch_size):
+    if db.session.execute(db.select(User.id).limit(1)).first():
+        raise click.ClickException('The database is not empty, seed a new one.')
+
+    if teachers > users or enrollments > users * courses or not (categories and courses and teachers):
+        raise click.ClickException('Invalid scale: check --teachers, --categories, --courses and --enrollments.')
+
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(db.text('PRAGMA synchronous = OFF'))
+
+    rng = random.Random(seed)
+    created_at = datetime.utcnow()
+    # every generated user shares one password, hashing it per row would take hours
+    password = password_hasher.hash(PERF_PASSWORD)
+
+    insert_rows(User, ({
+        'id': user_id, 'username': f'user {user_id}', 'email': PERF_EMAIL.format(user_id), 'password': password,
+        'created_at': created_at, 'role': 'admin' if user_id <= teachers else 'aluno',
+        'plan_type': 'premium' if rng.random() < 0.3 else 'free'
+    } for user_id in range(1, users + 1)), batch_size)
+
+    insert_rows(Category, ({'id': category_id, 'name': f'category {category_id}'} for category_id in range(1, categories + 1)), batch_size)
+
+    insert_rows(Course, ({
+        'id': course_id, 'title': f'{words(rng, 3)} {course_id}', 'description': words(rng, 20),
+        'teacher_id': rng.randint(1, teachers), 'category_id': rng.randint(1, categories),
+        'is_premium': rng.random() < 0.25, 'updated_at': created_at
+    } for course_id in range(1, courses + 1)), batch_size)
+
+    insert_rows(Video, ({
+        'id': video_id, 'title': f'{words(rng, 4)} {video_id}', 'resume': words(rng, 30),
+        'url': EMBED_URL.format(f'{video_id:011d}'), 'course_id': rng.randint(1, courses)
+    } for video_id in range(1, videos + 1)), batch_size)
+
+    insert_rows(Enrollment, enrollment_rows(rng, users, courses, enrollments, created_at), batch_size)
+
+    started = time.perf_counter()
+    counters.recount()
+    click.echo(f'{"counters":>12}: recounted in {time.perf_counter() - started:.1f}s')
+
+# Scenarios are named after the endpoint they hit, one for every route in
+# routes/. Each builds the request for its i-th call.
+
+SCENARIOS = {}
+
+def scenario(name, method, status=(200,)):
+    def register(build):
+        SCENARIOS[name] = SimpleNamespace(name=name, method=method, status=status, build=build)
+        return build
+    return register
+
+@scenario('auth.signup', 'POST', (201,))
+def signup(ctx, i):
+    return '/signup', {'json': {'username': f'perf {i}', 'email': f'signup-{ctx.run_id}-{i}@perf.local', 'password': PERF_PASSWORD}}
+
+@scenario('auth.login', 'POST')
+def login(ctx, i):
+    return '/login', {'json': {'email': PERF_EMAIL.format(ctx.rng.choice(ctx.student_ids)), 'password': PERF_PASSWORD}}
+
+@scenario('auth.get_teachers', 'GET')
+def get_teachers(ctx, i):
+    return '/users/teachers', {'headers': ctx.student_headers()}
+
+@scenario('auth.upgrade_plan', 'PUT')
+def upgrade_plan(ctx, i):
+    return '/users/upgrade_plan', {'headers': ctx.student_headers(), 'json': {'plan_value': ctx.rng.choice(['free', 'premium'])}}
+
+@scenario('category.get_categories', 'GET')
+def get_categories(ctx, i):
+    return '/categories', {}
+
+@scenario('category.add_category', 'POST', (201,))
+def add_category(ctx, i):
+    return '/categories/add', {'headers': ctx.admin_headers, 'json': {'name': f'perf {ctx.run_id} {i}'}}
+
+@scenario('category.delete_category', 'DELETE')
+def delete_category(ctx, i):
+    return f'/categories/delete/{ctx.fixtures["category"][i]}', {'headers': ctx.admin_headers}
+
+@scenario('course.get_courses', 'GET')
+def get_courses(ctx, i):
+    params = {'cursor': ctx.rng.choice(ctx.course_ids)}
+    if i % 2:
+        params['category_id'] = ctx.rng.choice(ctx.category_ids)
+    return '/courses', {'query_string': params}
+
+@scenario('course.get_details_course', 'GET')
+def get_details_course(ctx, i):
+    return f'/courses/{ctx.rng.choice(ctx.course_ids)}', {'headers': ctx.student_headers()}
+
+@scenario('course.get_details_courses', 'POST')
+def get_details_courses(ctx, i):
+    return '/courses/batch', {'headers': ctx.student_headers(), 'json': {'ids': ctx.rng.sample(ctx.course_ids, min(20, len(ctx.course_ids)))}}
+
+@scenario('course.get_myCourses', 'GET')
+def get_my_courses(ctx, i):
+    return '/my-courses', {'headers': ctx.student_headers()}
+
+@scenario('course.enroll_course', 'POST', (201, 400, 403))
+def enroll_course(ctx, i):
+    return f'/courses/{ctx.rng.choice(ctx.course_ids)}/enroll', {'headers': ctx.student_headers()}
+
+@scenario('course.add_course', 'POST', (201,))
+def add_course(ctx, i):
+    return '/courses/add', {'headers': ctx.admin_headers, 'json': {
+        'title': f'{words(ctx.rng, 3)} perf', 'description': words(ctx.rng, 20),
+        'teacher_id': ctx.admin_id, 'category_id': ctx.rng.choice(ctx.category_ids)
+    }}
+
+@scenario('course.update_course', 'PUT')
+def update_course(ctx, i):
+    return f'/courses/{ctx.rng.choice(ctx.course_ids)}/update', {'headers': ctx.admin_headers, 'json': {'title': f'{words(ctx.rng, 3)} {i}'}}
+
+@scenario('course.delete_course', 'DELETE')
+def delete_course(ctx, i):
+    return f'/courses/{ctx.fixtures["course"][i]}/delete', {'headers': ctx.admin_headers}
+
+@scenario('search.search_catalog', 'GET')
+def search_catalog(ctx, i):
+    return '/search', {'query_string': {'q': words(ctx.rng, 1 + i % 2)}}
+
+@scenario('video.view_video', 'GET')
+def view_video(ctx, i):
+    return f'/videos/{ctx.rng.choice(ctx.video_ids)}', {'headers': ctx.student_headers()}
+
+@scenario('video.record_progress', 'POST', (202,))
+def record_progress(ctx, i):
+    return f'/videos/{ctx.rng.choice(ctx.video_ids)}/progress', {'headers': ctx.student_headers(), 'json': {'position': 5 * i, 'duration': 600}}
+
+@scenario('video.add_video', 'POST', (201,))
+def add_video(ctx, i):
+    return '/videos/add', {'headers': ctx.admin_headers, 'json': {
+        'title': words(ctx.rng, 4), 'resume': words(ctx.rng, 30), 'url': f'https://perf.local/{ctx.run_id}/add/{i}',
+        'course_id': ctx.rng.choice(ctx.course_ids)
+    }}
+
+@scenario('video.add_videos_bulk', 'POST', (201,))
+def add_videos_bulk(ctx, i):
+    return '/videos/bulk', {'headers': ctx.admin_headers, 'json': [{
+        'title': words(ctx.rng, 4), 'url': f'https://perf.local/{ctx.run_id}/bulk/{i}/{n}', 'course_id': ctx.rng.choice(ctx.course_ids)
+    } for n in range(50)]}
+
+@scenario('video.update_video', 'PUT')
+def update_video(ctx, i):
+    return f'/videos/{ctx.rng.choice(ctx.video_ids)}/update', {'headers': ctx.admin_headers, 'json': {'title': f'{words(ctx.rng, 4)} {i}'}}
+
+@scenario('video.delete_video', 'DELETE')
+def delete_video(ctx, i):
+    return f'/videos/{ctx.fixtures["video"][i]}/delete', {'headers': ctx.admin_headers}
+
+def sample_ids(column, rng, size, *where):
+    ids = db.session.execute(db.select(column).where(*where).order_by(column)).scalars().all()
+    return rng.sample(ids, min(size, len(ids)))
+
+def prepare(count, seed):
+    # Runs in the app context: reads ids to hit, mints tokens and inserts
+    # the rows the delete scenarios remove. Nothing here is timed.
+    rng = random.Random(seed)
+    run_id = f'{int(time.time())}'
+
+    admin = db.session.execute(db.select(User.id, User.role, User.plan_type).where(User.role == 'admin').order_by(User.id)).first()
+    students = db.session.execute(
+        db.select(User.id, User.role, User.plan_type).where(User.role != 'admin', User.email.like(PERF_EMAIL.format('%'))).order_by(User.id).limit(1000)
+    ).all()
+    if not admin or not students:
+        raise click.ClickException("No generated users found, run 'flask perf seed' first.")
+
+    fixtures = {
+        'category': [{'name': f'perf fixture {run_id} {i}'} for i in range(count)],
+        'course': [{'title': f'perf fixture {i}', 'teacher_id': admin.id, 'category_id': None} for i in range(count)],
+        'video': [{'title': f'perf fixture {i}', 'url': f'https://perf.local/{run_id}/fixture/{i}', 'course_id': None} for i in range(count)]
+    }
+
+    category_ids = sample_ids(Category.id, rng, 1000)
+    course_ids = sample_ids(Course.id, rng, 1000)
+    for row in fixtures['course']:
+        row['category_id'] = rng.choice(category_ids)
+    for row in fixtures['video']:
+        row['course_id'] = rng.choice(course_ids)
+
+    for name, model in (('category', Category), ('course', Course), ('video', Video)):
+        fixtures[name] = db.session.execute(db.insert(model).returning(model.id, sort_by_parameter_order=True), fixtures[name]).scalars().all()
+    db.session.commit()
+    counters.recount()
+
+    student_tokens = [{'Authorization': f'Bearer {create_user_token(student)}'} for student in students]
+    return SimpleNamespace(
+        rng=rng, run_id=run_id, fixtures=fixtures, admin_id=admin.id,
+        admin_headers={'Authorization': f'Bearer {create_user_token(admin)}'},
+        student_headers=lambda: rng.choice(student_tokens),
+        student_ids=[student.id for student in students], category_ids=category_ids, course_ids=course_ids,
+        video_ids=sample_ids(Video.id, rng, 1000, Video.id.not_in(fixtures['video'])) or fixtures['video']
+    )
+
+def percentile(values, percent):
+    return values[min(len(values) - 1, round(percent / 100 * (len(values) - 1)))]
+
+def run_scenario(app, ctx, item, count, concurrency):
+    # Requests are built up front so every run sends the same ones.
+    requests = [item.build(ctx, i) for i in range(count)]
+    local = threading.local()
+
+    def send(request):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+
+        path, kwargs = request
+        started = time.perf_counter()
+        response = local.client.open(path, method=item.method, **kwargs)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code
+
+    statements, db_seconds = metrics.statements[item.name], metrics.db_seconds[item.name]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    statuses = Counter(status for _, status in results)
+    return {
+        'requests': count,
+        'errors': sum(total for status, total in statuses.items() if status not in item.status),
+        'statuses': {str(status): total for status, total in sorted(statuses.items())},
+        'throughput_rps': round(count / elapsed, 1),
+        'latency_ms': {
+            'mean': round(sum(latencies) / count, 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3)
+        },
+        'db_statements_per_request': round((metrics.statements[item.name] - statements) / count, 2),
+        'db_ms_per_request': round((metrics.db_seconds[item.name] - db_seconds) * 1000 / count, 3)
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def html_report(report):
+    columns = ['requests', 'errors', 'throughput_rps', 'mean', 'p50', 'p90', 'p99', 'max', 'db_statements_per_request', 'db_ms_per_request']
+    rows = []
+    for name, result in report['scenarios'].items():
+        values = {**result, **result['latency_ms']}
+        rows.append('<tr><td>' + escape(name) + '</td>' + ''.join(f'<td>{values[column]}</td>' for column in columns) + '</tr>')
+
+    meta = ''.join(f'<li>{escape(key)}: {escape(str(value))}</li>' for key, value in report['meta'].items())
+    return (
+        '<!doctype html><meta charset="utf-8"><title>perf report</title>'
+        '<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:right}td:first-child{text-align:left}</style>'
+        f'<ul>{meta}</ul><table><tr><th>scenario</th>' + ''.join(f'<th>{column}</th>' for column in columns) + '</tr>'
+        + ''.join(rows) + '</table>\n'
+    )
+
+@perf_cli.command('run', with_appcontext=False, help='Replay every route scenario with concurrent clients and write a report.')
+@click.option('--requests', 'count', default=200, help='Requests per scenario.')
+@click.option('--concurrency', default=8, help='Concurrent clients.')
+@click.option('--scenario', 'names', multiple=True, type=click.Choice(list(SCENARIOS)), help='Only run these scenarios.')
+@click.option('--seed', default=1, help='Random seed for the generated requests.')
+@click.option('--output', default='perf-report.json', type=click.Path(dir_okay=False), help='JSON report.')
+@click.option('--html', type=click.Path(dir_okay=False), help='Also write an HTML report.')
+def run_command(count, concurrency, names, seed, output, html):
+    from app import create_app
+
+    # rate limits would turn the load into 429s, and the login log is noise here
+    app = create_app({'RATELIMIT_ENABLED': False, 'METRICS_ENABLED': True, 'DB_MIGRATIONS': False, 'LOG_SAMPLE_RATE': 0})
+
+    with app.app_context():
+        ctx = prepare(count, seed)
+        rows = {model.__tablename__: db.session.execute(db.select(db.func.count()).select_from(model)).scalar() for model in (User, Course, Video, Enrollment)}
+        dialect = db.session.get_bind().dialect.name
+        db.session.remove()
+
+    report = {
+        'meta': {
+            'commit': git_commit(), 'date': datetime.utcnow().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__, 'database': dialect, 'rows': rows, 'requests': count, 'concurrency': concurrency, 'seed': seed
+        },
+        'scenarios': {}
+    }
+
+    for name in names or SCENARIOS:
+        result = run_scenario(app, ctx, SCENARIOS[name], count, concurrency)
+        report['scenarios'][name] = result
+        click.echo(f'{name:<28} p50 {result["latency_ms"]["p50"]:>9.2f}ms  p99 {result["latency_ms"]["p99"]:>9.2f}ms  '
+                   f'{result["throughput_rps"]:>8.1f} req/s  {result["db_statements_per_request"]:>5} stmts  {result["errors"]} errors')
+
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    if html:
+        with open(html, 'w') as file:
+            file.write(html_report(report))
+
+@perf_cli.command('compare', with_appcontext=False, help='Show how two reports written by "flask perf run" differ.')
+@click.argument('before', type=click.File())
+@click.argument('after', type=click.File())
+def compare_command(before, after):
+    before, after = json.load(before), json.load(after)
+    click.echo(f'{before["meta"]["commit"]} -> {after["meta"]["commit"]}')
+
+    def change(old, new):
+        return f'{old:>9.2f} -> {new:>9.2f} ({(new - old) / old * 100 if old else 0:+6.1f}%)'
+
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            click.echo(f'{name:<28} new')
+            continue
+
+        click.echo(f'{name:<28} p50 {change(old["latency_ms"]["p50"], new["latency_ms"]["p50"])}  '
+                   f'p99 {change(old["latency_ms"]["p99"], new["latency_ms"]["p99"])}  '
+                   f'stmts {old["db_statements_per_request"]} -> {new["db_statements_per_request"]}')
+
+@perf_cli.command('viewers', with_appcontext=False, help='Simulate viewers sending playback heartbeats through the progress buffer.')
+@click.option('--viewers', default=10000, help='Generated users watching at the same time.')
+@click.option('--beats', default=3, help='Heartbeats sent by each viewer.')
+@click.option('--concurrency', default=16, help='Concurrent clients.')
+@click.option('--seed', default=1, help='Random seed for the watched videos.')
+def viewers_command(viewers, beats, concurrency, seed):
+    from app import create_app
+
+    app = create_app({'RATELIMIT_ENABLED': False, 'DB_MIGRATIONS': False, 'LOG_SAMPLE_RATE': 0})
+    rng = random.Random(seed)
+
+    with app.app_context():
+        users = db.session.execute(
+            db.select(User.id, User.role, User.plan_type).where(User.email.like(PERF_EMAIL.format('%'))).order_by(User.id).limit(viewers)
+        ).all()
+        video_ids = db.session.execute(db.select(Video.id)).scalars().all()
+        if len(users) < viewers or not video_ids:
+            raise click.ClickException(f"Found {len(users)} generated users, run 'flask perf seed --users {viewers}' first.")
+
+        watching = [({'Authorization': f'Bearer {create_user_token(user)}'}, rng.choice(video_ids)) for user in users]
+        rows_before = db.session.execute(db.select(db.func.count(VideoProgress.id))).scalar()
+        db.session.remove()
+
+    # every viewer sends its n-th beat before anyone sends the next one
+    requests = [
+        (f'/videos/{video_id}/progress', {'headers': headers, 'json': {'position': 5 * (beat + 1), 'duration': 600}})
+        for beat in range(beats) for headers, video_id in watching
+    ]
+    item = SimpleNamespace(name='video.record_progress', method='POST', status=(202,), build=lambda ctx, i: requests[i])
+    result = run_scenario(app, None, item, len(requests), concurrency)
+
+    started = time.perf_counter()
+    progress.buffer.flush()
+    drained = time.perf_counter() - started
+
+    with app.app_context():
+        rows_after = db.session.execute(db.select(db.func.count(VideoProgress.id))).scalar()
+
+    click.echo(f'{len(requests)} heartbeats from {viewers} viewers: p50 {result["latency_ms"]["p50"]:.2f}ms  '
+               f'p99 {result["latency_ms"]["p99"]:.2f}ms  {result["throughput_rps"]} req/s  {result["errors"]} errors')
+    click.echo(f'{rows_after - rows_before} new progress rows, last flush took {drained * 1000:.0f}ms')
+
+@perf_cli.command('retries', with_appcontext=False, help='Send parallel retries of course creations with the same Idempotency-Key.')
+@click.option('--keys', default=200, help='Distinct creations, each with its own key.')
+@click.option('--retries', default=8, help='Identical requests sent for every key.')
+@click.option('--concurrency', default=8, help='Concurrent clients.')
+def retries_command(keys, retries, concurrency):
+    from app import create_app
+
+    app = create_app({'RATELIMIT_ENABLED': False, 'DB_MIGRATIONS': False, 'LOG_SAMPLE_RATE': 0})
+    run_id = f'{int(time.time())}'
+
+    with app.app_context():
+        admin = db.session.execute(db.select(User.id, User.role, User.plan_type).where(User.role == 'admin').order_by(User.id)).first()
+        category_id = db.session.execute(db.select(Category.id).order_by(Category.id)).scalar()
+        if not admin or category_id is None:
+            raise click.ClickException("No admin or category found, run 'flask perf seed' first.")
+        headers = {'Authorization': f'Bearer {create_user_token(admin)}'}
+        db.session.remove()
+
+    # the retries of a key are next to each other, so they run in parallel
+    requests = [
+        ('/courses/add', {'headers': {**headers, 'Idempotency-Key': f'{run_id}-{key}'}, 'json': {
+            'title': f'retry {run_id} {key}', 'teacher_id': admin.id, 'category_id': category_id
+        }})
+        for key in range(keys) for _ in range(retries)
+    ]
+    item = SimpleNamespace(name='course.add_course', method='POST', status=(201, 409), build=lambda ctx, i: requests[i])
+    result = run_scenario(app, None, item, len(requests), concurrency)
+
+    with app.app_context():
+        created = Counter(db.session.execute(db.select(Course.title).where(Course.title.like(f'retry {run_id} %'))).scalars())
+
+    duplicates = sum(1 for total in created.values() if total > 1)
+    click.echo(f'{len(requests)} requests for {keys} keys: statuses {result["statuses"]}  p50 {result["latency_ms"]["p50"]:.2f}ms  '
+               f'p99 {result["latency_ms"]["p99"]:.2f}ms  {result["errors"]} errors')
+    click.echo(f'{len(created)} courses created, {keys - len(created)} missing, {duplicates} duplicated')
+    if duplicates or len(created) != keys:
+        raise SystemExit(1)
+
+@perf_cli.command('logins', with_appcontext=False, help='Measure a route alone and again during a login storm on the password hash pool.')
+@click.option('--logins', default=200, help='Logins sent during the storm.')
+@click.option('--requests', 'count', default=500, help='Requests sent to the measured route, alone and during the storm.')
+@click.option('--concurrency', default=8, help='Concurrent clients, for the storm and for the measured route each.')
+@click.option('--workers', default=2, help='PASSWORD_HASH_WORKERS for this run, 0 hashes in the request thread.')
+@click.option('--scenario', 'name', default='course.get_details_course', type=click.Choice(list(SCENARIOS)), help='Route to measure.')
+@click.option('--seed', default=1, help='Random seed for the generated requests.')
+def logins_command(logins, count, concurrency, workers, name, seed):
+    from app import create_app
+
+    app = create_app({'RATELIMIT_ENABLED': False, 'DB_MIGRATIONS': False, 'LOG_SAMPLE_RATE': 0, 'PASSWORD_HASH_WORKERS': workers})
+
+    with app.app_context():
+        ctx = prepare(1, seed)
+        db.session.remove()
+
+    item, login = SCENARIOS[name], SCENARIOS['auth.login']
+    # starts the hashing processes, so the storm doesn't time their startup
+    run_scenario(app, ctx, login, max(workers, 1) * 2, max(workers, 1))
+
+    alone = run_scenario(app, ctx, item, count, concurrency)
+
+    storm = {}
+    thread = threading.Thread(target=lambda: storm.update(run_scenario(app, ctx, login, logins, concurrency)))
+    thread.start()
+    during = run_scenario(app, ctx, item, count, concurrency)
+    thread.join()
+
+    for label, result in (('alone', alone), ('during storm', during)):
+        click.echo(f'{name} {label:<13} p50 {result["latency_ms"]["p50"]:>9.2f}ms  p99 {result["latency_ms"]["p99"]:>9.2f}ms  '
+                   f'{result["throughput_rps"]:>8.1f} req/s  {result["errors"]} errors')
+    click.echo(f'{logins} logins with {workers} hash workers: statuses {storm["statuses"]}  p50 {storm["latency_ms"]["p50"]:.2f}ms  '
+               f'p99 {storm["latency_ms"]["p99"]:.2f}ms')
+
+# read routes the ASGI app serves too
+ASGI_SCENARIOS = ['course.get_courses', 'course.get_details_course', 'video.view_video', 'course.get_myCourses']
+
+async def asgi_send(asgi, method, path, kwargs):
+    # the smallest ASGI client: one request, the response read and dropped
+    status = None
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await asgi({
+        'type': 'http', 'method': method, 'path': path, 'query_string': urlencode(kwargs.get('query_string', {})).encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in kwargs.get('headers', {}).items()]
+    }, receive, send)
+    return status
+
+async def run_asgi(asgi, item, requests, concurrency):
+    # one task per client, like the threads of run_scenario
+    pending = iter(requests)
+    results = []
+
+    async def client():
+        for path, kwargs in pending:
+            started = time.perf_counter()
+            status = await asgi_send(asgi, item.method, path, kwargs)
+            results.append((time.perf_counter() - started, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        'errors': sum(1 for _, status in results if status not in item.status),
+        'throughput_rps': round(len(results) / elapsed, 1),
+        'latency_ms': {'p50': round(percentile(latencies, 50), 3), 'p99': round(percentile(latencies, 99), 3)}
+    }
+
+@perf_cli.command('asgi', with_appcontext=False, help='Compare the Flask and ASGI apps on a read route at rising concurrency.')
+@click.option('--requests', 'count', default=1000, help='Requests per app and concurrency level.')
+@click.option('--concurrency', 'levels', default='8,64,256', help='Comma separated numbers of concurrent clients.')
+@click.option('--scenario', 'name', default='course.get_details_course', type=click.Choice(ASGI_SCENARIOS), help='Route to compare.')
+@click.option('--seed', default=1, help='Random seed for the generated requests.')
+def asgi_command(count, levels, name, seed):
+    from app import create_app
+    from asgi import create_asgi_app
+
+    app = create_app({'RATELIMIT_ENABLED': False, 'DB_MIGRATIONS': False, 'LOG_SAMPLE_RATE': 0})
+
+    with app.app_context():
+        ctx = prepare(1, seed)
+        db.session.remove()
+
+    # both apps get the same requests, Flask on a thread per client and
+    # ASGI on a task per client in a single thread
+    requests = [SCENARIOS[name].build(ctx, i) for i in range(count)]
+    item = SimpleNamespace(name=name, method=SCENARIOS[name].method, status=SCENARIOS[name].status, build=lambda ctx, i: requests[i])
+
+    def run_flask(concurrency):
+        return run_scenario(app, ctx, item, count, concurrency)
+
+    def run_async(concurrency):
+        async def run():
+            asgi = create_asgi_app()
+            try:
+                return await run_asgi(asgi, item, requests, concurrency)
+            finally:
+                await asgi.engine.dispose()
+        return asyncio.run(run())
+
+    for concurrency in (int(level) for level in levels.split(',')):
+        for label, run in (('flask', run_flask), ('asgi', run_async)):
+            result = run(concurrency)
+
+            # a second pass for memory, tracemalloc would skew the timings;
+            # it sees the Python heap, not the stacks of Flask's threads
+            tracemalloc.start()
+            run(concurrency)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            click.echo(f'{label:<5} {concurrency:>4} clients  p50 {result["latency_ms"]["p50"]:>9.2f}ms  p99 {result["latency_ms"]["p99"]:>9.2f}ms  '
+                       f'{result["throughput_rps"]:>8.1f} req/s  peak heap {peak / 2 ** 20:>6.1f}MiB  {result["errors"]} errors')
@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from collections import namedtuple
+
+from flask import g, jsonify, request
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+
+from cache import LRUCache
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# A bucket holds up to `capacity` requests and refills evenly over `period`
+# seconds, so '10/minute' allows a burst of 10 and then one every 6s.
+Limit = namedtuple('Limit', ['capacity', 'period'])
+
+def parse_limit(value):
+    count, period = value.split('/')
+    return Limit(int(count), PERIODS[period])
+
+
+class BucketStore:
+    # Shared stores (a redis script, a database row...) only need take(): it
+    # refills the bucket to `now`, takes one token if there is one and
+    # returns (allowed, tokens left), atomically for the key.
+
+    def take(self, key, limit, now):
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    # Buckets are spread over shards with a lock each, so threads only
+    # contend when their keys land on the same shard.
+
+    def __init__(self, shards=16, max_keys=4096):
+        self.max_keys = max_keys
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def take(self, key, limit, now):
+        buckets, lock = self._shards[hash(key) % len(self._shards)]
+        rate = limit.capacity / limit.period
+
+        with lock:
+            tokens, updated, _ = buckets.get(key, (limit.capacity, now, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            buckets[key] = (tokens, now, now + (limit.capacity - tokens) / rate)
+            if len(buckets) > self.max_keys:
+                self._prune(buckets, now)
+
+        return allowed, tokens
+
+    def _prune(self, buckets, now):
+        # A bucket that has refilled is the same as no bucket at all.
+        for key in [key for key, (_, _, full_at) in buckets.items() if full_at <= now]:
+            del buckets[key]
+
+        # Still too many active clients: forget the least recently created,
+        # which only makes the limiter more lenient for them.
+        for key in list(buckets)[:len(buckets) - self.max_keys * 3 // 4]:
+            del buckets[key]
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.store = None
+        self.limits = {}
+        self.methods = frozenset()
+        self.identities = LRUCache(maxsize=4096, ttl=60)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORE', None)
+        app.config.setdefault('RATELIMIT_LIMITS', {})
+        app.config.setdefault('RATELIMIT_METHODS', ['POST', 'PUT', 'PATCH', 'DELETE'])
+
+        self.store = app.config['RATELIMIT_STORE'] or MemoryBucketStore()
+        self.limits = {blueprint: parse_limit(value) for blueprint, value in app.config['RATELIMIT_LIMITS'].items() if value}
+        self.methods = frozenset(app.config['RATELIMIT_METHODS'])
+        app.extensions['rate_limiter'] = self
+
+        if app.config['RATELIMIT_ENABLED']:
+            app.before_request(self.check)
+            app.after_request(self.add_headers)
+
+    def client_key(self):
+        # Signed-in clients get their own bucket. A token's signature is
+        # checked once and its identity cached until it expires (at most a
+        # minute), instead of on every request. A bad token falls back to
+        # the address and is rejected by the view as usual.
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            return f'ip:{request.remote_addr}'
+
+        token = authorization[len('Bearer '):]
+        identity = self.identities.get(token)
+        if identity is None:
+            try:
+                claims = decode_token(token)
+            except (JWTExtendedException, PyJWTError):
+                return f'ip:{request.remote_addr}'
+
+            identity = claims['sub']
+            ttl = min(self.identities.ttl, max(claims['exp'] - time.time(), 1)) if 'exp' in claims else None
+            self.identities.set(token, identity, ttl=ttl)
+        return f'user:{identity}'
+
+    def check(self):
+        limit = self.limits.get(request.blueprint)
+        if limit is None or request.method not in self.methods:
+            return None
+
+        allowed, tokens = self.store.take(f'{request.blueprint}:{self.client_key()}', limit, time.time())
+        g.rate_limit = (limit, tokens)
+
+        if not allowed:
+            retry_after = (1 - tokens) * limit.period / limit.capacity
+            return jsonify({'message': 'Too many requests, try again'}), 429, {'Retry-After': str(math.ceil(retry_after))}
+        return None
+
+    def add_headers(self, response):
+        rate_limit = g.pop('rate_limit', None)
+        if rate_limit is not None:
+            limit, tokens = rate_limit
+            response.headers['RateLimit-Limit'] = str(limit.capacity)
+            response.headers['RateLimit-Remaining'] = str(int(tokens))
+            response.headers['RateLimit-Reset'] = str(math.ceil((limit.capacity - tokens) * limit.period / limit.capacity))
+        return response
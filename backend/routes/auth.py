@@ -1,12 +1,25 @@
-from extensions import db
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+import logging
+from extensions import db, password_hasher
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User
+from authz import create_user_token, forget_identity
+from metrics import log_event
+from services import directory
+from services.idempotency import idempotent
+from services.passwords import HashQueueFull
+from serializers import teachers
+from streaming import stream_rows, wants_stream
 
 auth_bp = Blueprint('auth', __name__)
 
+log = logging.getLogger(__name__)
+
+def too_many_requests():
+    return jsonify({'message': 'Too many requests, try again'}), 429, {'Retry-After': '1'}
+
 @auth_bp.route('/signup', methods=["POST"])
+@idempotent
 def signup():
     data = request.json
 
@@ -20,7 +33,10 @@ def signup():
         if user_exist:
             return jsonify({'message': 'User already exist'}), 400
         
-        hashed_password = generate_password_hash(data['password'])
+        try:
+            hashed_password = password_hasher.hash(data['password'])
+        except HashQueueFull:
+            return too_many_requests()
 
         user = User(username=data['username'], email=data['email'], password=hashed_password)
         db.session.add(user)
@@ -32,44 +48,51 @@ def signup():
 def login():
     data = request.json
 
-    print("1. O React enviou isso:", data)
-
     if data.get('email') and data.get('password'):
-        query = db.select(User).where(User.email == data['email'])
-        user = db.session.execute(query).scalar()
-
-        print("2. O Flask achou esse usuário no banco:", user)
+        query = db.select(User.id, User.password, User.role, User.plan_type).where(User.email == data['email'])
+        user = db.session.execute(query).first()
+        # don't hold a pooled connection while the hash is being checked
+        db.session.close()
 
         if not user:
+            log_event(log, 'login', outcome='unknown_email', ip=request.remote_addr)
             return jsonify({'message': 'Unauthorized'}), 401
         
-        if check_password_hash(user.password, data.get('password')):
-            access_token = create_access_token(identity=str(user.id))
+        try:
+            valid_password = password_hasher.verify(user.password, data['password'])
+        except HashQueueFull:
+            log_event(log, 'login', outcome='busy', user_id=user.id)
+            return too_many_requests()
+
+        if valid_password:
+            try:
+                if password_hasher.needs_rehash(user.password):
+                    db.session.execute(db.update(User).where(User.id == user.id).values(password=password_hasher.hash(data['password'])))
+                    db.session.commit()
+            except HashQueueFull:
+                # the password is already verified, the upgrade waits for a later login
+                log_event(log, 'rehash', outcome='busy', user_id=user.id)
+
+            log_event(log, 'login', sample_rate=current_app.config['LOG_SAMPLE_RATE'], outcome='ok', user_id=user.id)
+            access_token = create_user_token(user)
             return jsonify({
                 'message': 'Login successful!',
                 'access_token': access_token,
                 'role': user.role,
                 'plan_type': user.plan_type
             }), 200
+
+        log_event(log, 'login', outcome='bad_password', user_id=user.id, ip=request.remote_addr)
         
     return jsonify({'message': 'Unauthorized'}), 401
 
 @auth_bp.route('/users/teachers', methods=["GET"])
 @jwt_required()
 def get_teachers():
-    teachers = db.session.execute(db.select(User).where(User.role == 'admin')).scalars().all()
+    if wants_stream():
+        return stream_rows(teachers())
 
-    if not teachers:
-        return jsonify({'message': 'Teachers not found'}), 404
-    
-    teacher_list = []
-    for teacher in teachers:
-        content_data = {
-            'id': teacher.id,
-            'username': teacher.username
-        }
-        teacher_list.append(content_data)
-    return jsonify(teacher_list), 200
+    return directory.respond()
 
 @auth_bp.route('/users/upgrade_plan', methods=["PUT"])
 @jwt_required()
@@ -83,4 +106,8 @@ def upgrade_plan():
     
     user.plan_type = plan['plan_value']
     db.session.commit()
-    return jsonify({'message': 'Updated plan'}), 200
\ No newline at end of file
+    forget_identity(user.id)
+    return jsonify({
+        'message': 'Updated plan',
+        'access_token': create_user_token(user)
+    }), 200
\ No newline at end of file
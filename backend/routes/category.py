@@ -1,71 +1,69 @@
 from extensions import db
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from models import Category, User
+from sqlalchemy.exc import IntegrityError
+from authz import admin_required
+from database import use_replica
+from models import Category
+from serializers import categories
+from services import catalog
+from services.idempotency import idempotent
+from streaming import stream_rows, wants_stream
 
 category_bp = Blueprint('category', __name__)
 
 @category_bp.route('/categories/add', methods=["POST"])
-@jwt_required()
+@admin_required
+@idempotent
 def add_category():
     data = request.json
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if 'name' in data:
         if not data["name"].strip():
             return jsonify({'message': 'Name cannot be empty'}), 400
-        
-        query = db.select(Category).where(Category.name == data['name'])
-        category_exist = db.session.execute(query).scalar()
 
-        if category_exist:
-            return jsonify({'message': 'Category already exist'}), 400
-        
+        # the unique name is checked by the insert itself, not a SELECT first
         category = Category(name=data['name'])
         db.session.add(category)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'message': 'Category already exist'}), 400
         return jsonify({'message': 'Category created successfully'}), 201
     
     return jsonify({'message': 'Invalid data'}), 400
 
 @category_bp.route('/categories/delete/<int:category_id>', methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_category(category_id):
     category = db.session.get(Category, category_id)
 
     if not category:
         return jsonify({'message': 'Category not found'}), 404
     
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-    
-    if  len(category.courses) > 0:
+    if category.course_count > 0:
         return jsonify({'message': 'This category has assigned courses'}), 400
     
-    db.session.delete(category)
+    db.session.execute(db.delete(Category).where(Category.id == category_id))
+    catalog.changed(categories=[category_id])
     db.session.commit()
     return jsonify({'message': 'Category successfully deleted'}), 200
 
 @category_bp.route('/categories', methods=["GET"])
+@use_replica
 def get_categories():
-    categories = db.session.execute(db.select(Category)).scalars().all()
+    if wants_stream():
+        return stream_rows(categories())
+
+    body = catalog.store.categories()
 
-    if not categories:
+    if body is None:
         return jsonify({'message': 'Categories not found'}), 404
 
-    categories_list = []
+    return catalog.respond(body)
 
-    for category in categories:
-        category_content = {
-            'id': category.id,
-            'name': category.name
-        }
-        categories_list.append(category_content)
-    return jsonify(categories_list), 200
\ No newline at end of file
+@category_bp.route('/catalog/check', methods=["GET"])
+@admin_required
+def check_catalog():
+    version, differences = catalog.store.check()
+    return jsonify({'version': version, 'differences': differences}), 200
@@ -1,20 +1,37 @@
-from extensions import db
+from extensions import db, response_cache
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from models import Category, User, Course, Enrollment
+import click
+from flask_jwt_extended import current_user, jwt_required
+from authz import admin_required
+from database import use_replica
+from services import catalog, counters, enrollment
+from services.idempotency import idempotent
+from serializers import (
+    as_dicts, completion, course_details, course_details_many, course_page, course_videos, course_videos_many, user_enrollment_count,
+    user_enrollments
+)
+from streaming import stream_rows, wants_stream
+from models import Category, User, Course, Video, VideoProgress
 
 course_bp = Blueprint('course', __name__)
 
+COURSES_PAGE_SIZE = 50
+COURSES_MAX_PAGE_SIZE = 100
+COURSES_BATCH_MAX_SIZE = 100
+
+def details_dict(course, videos):
+    details = course._asdict()
+    details['is_enrolled'] = bool(details['is_enrolled'])
+    details['completion'] = completion(details['completed_videos'], details['video_count'])
+    details['videos'] = videos
+    return details
+
 @course_bp.route('/courses/add', methods=["POST"])
-@jwt_required()
+@admin_required
+@idempotent
 def add_course():
     data = request.json
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not 'title' in data or not 'teacher_id' in data or not 'category_id' in data:
         return jsonify({'message': 'Invalid data'}), 400
     
@@ -32,78 +49,83 @@ def add_course():
     if data['title'].strip():
         course = Course(title=data['title'], description=data.get('description', ''), teacher_id=data['teacher_id'], category_id=data['category_id'])
         db.session.add(course)
+        counters.add_courses(course.category_id)
         db.session.commit()
         return jsonify({'message': 'Course successfully added'}), 201
     return jsonify({'message': 'Invalid title'}), 400
 
 @course_bp.route('/courses', methods=["GET"])
+@use_replica
 def get_courses():
-    courses = db.session.execute(db.select(Course)).scalars().all()
+    limit = request.args.get('limit', COURSES_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor', type=int)
+    category_id = request.args.get('category_id', type=int)
+    is_premium = request.args.get('is_premium')
+
+    if limit < 1 or limit > COURSES_MAX_PAGE_SIZE:
+        return jsonify({'message': 'Invalid limit'}), 400
+
+    if is_premium is not None:
+        if is_premium.lower() in ('1', 'true'):
+            is_premium = True
+        elif is_premium.lower() in ('0', 'false'):
+            is_premium = False
+        else:
+            return jsonify({'message': 'Invalid is_premium'}), 400
 
-    courses_list = []
+    if wants_stream():
+        return stream_rows(course_page(cursor, category_id, is_premium))
 
-    for course in courses:
-        course_content = {
-            'id': course.id,
-            'title': course.title,
-            'category': course.category.name
-        }
-        courses_list.append(course_content)
-    return jsonify(courses_list), 200
+    body, next_cursor = catalog.store.courses(cursor, limit, category_id, is_premium)
+    return catalog.respond(body, {'X-Next-Cursor': str(next_cursor)} if next_cursor is not None else None)
 
 @course_bp.route('/courses/<int:course_id>', methods=["GET"])
 @jwt_required()
+@use_replica
 def get_details_course(course_id):
-    course = db.session.get(Course, course_id)
+    course = db.session.execute(course_details(course_id, current_user.id)).first()
 
     if not course:
         return jsonify({'message': 'Course not found'}), 404
-    
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
 
-    query = db.select(Enrollment).where((Enrollment.user_id == user.id) & (Enrollment.course_id == course_id))
-    enroll = db.session.execute(query).scalar()
+    return jsonify(details_dict(course, as_dicts(db.session.execute(course_videos(course_id))))), 200
 
-    if enroll:
-        is_enrolled = True
-    else:
-        is_enrolled = False
-    
-    list_videos = []
-    for video in course.videos:
-        list_videos.append({
-            'id': video.id,
-            'title': video.title,
-            'url': video.url,
-            'resume': video.resume
-        })
-    
-    return jsonify({
-        'id': course.id,
-        'title': course.title,
-        'description': course.description,
-        'videos': list_videos,
-        'teacher': course.teacher.username,
-        'category': course.category.name,
-        'is_enrolled': is_enrolled,
-        'is_premium': course.is_premium
-    }), 200
+@course_bp.route('/courses/batch', methods=["POST"])
+@jwt_required()
+@use_replica
+def get_details_courses():
+    data = request.json
+    course_ids = data.get('ids') if isinstance(data, dict) else None
+
+    if not isinstance(course_ids, list) or not course_ids or not all(type(course_id) is int for course_id in course_ids):
+        return jsonify({'message': 'Invalid data'}), 400
+
+    course_ids = list(dict.fromkeys(course_ids))
+    if len(course_ids) > COURSES_BATCH_MAX_SIZE:
+        return jsonify({'message': f'At most {COURSES_BATCH_MAX_SIZE} courses per request'}), 400
+
+    # two statements whatever the number of ids: the details with the user's
+    # enrollment and completion, then the videos of every course
+    courses = {course.id: course for course in db.session.execute(course_details_many(course_ids, current_user.id))}
+    videos = {course_id: [] for course_id in courses}
+    if courses:
+        for video in db.session.execute(course_videos_many(list(courses))):
+            video = video._asdict()
+            videos[video.pop('course_id')].append(video)
+
+    # same order as the request; ids that don't exist are left out
+    return jsonify([details_dict(courses[course_id], videos[course_id]) for course_id in course_ids if course_id in courses]), 200
 
 @course_bp.route('/courses/<int:course_id>/update', methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_course(course_id):
     course = db.session.get(Course, course_id)
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not course:
         return jsonify({'message': 'Course not found'}), 404
     
     data = request.json
+    old_category_id = course.category_id
 
     if 'title' in data:
         if not data['title'].strip():
@@ -131,67 +153,78 @@ def update_course(course_id):
         else:
             course.category_id = data['category_id']
     
+    if course.category_id != old_category_id:
+        counters.add_courses(old_category_id, -1)
+        counters.add_courses(course.category_id)
+
     db.session.commit()
+    response_cache.invalidate(f'course:{course.id}')
     return jsonify({'message': 'Course successfully updated.'}), 200
 
 @course_bp.route('/courses/<int:course_id>/delete', methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_course(course_id):
     course = db.session.get(Course, course_id)
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not course:
         return jsonify({'message': 'Course not found'}), 404
     
+    # SQLite only cascades with foreign keys enabled
+    db.session.execute(db.delete(VideoProgress).where(VideoProgress.video_id.in_(db.select(Video.id).where(Video.course_id == course_id))))
     db.session.delete(course)
+    counters.add_courses(course.category_id, -1)
     db.session.commit()
+    response_cache.invalidate(f'course:{course_id}')
     return jsonify({'message': 'Course successfully deleted'}), 200
 
 @course_bp.route('/courses/<int:course_id>/enroll', methods=["POST"])
 @jwt_required()
 def enroll_course(course_id):
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    
-    query = db.select(Enrollment).where((Enrollment.user_id == user.id) & (Enrollment.course_id == course_id))
-    enroll_exist = db.session.execute(query).scalar()
-
-    if enroll_exist:
-        return jsonify({'message': 'User already enrolled'}), 400
-    
-    course = db.session.get(Course, course_id)
+    result = enrollment.enroll(current_user.id, course_id)
 
-    if not course:
+    if result == enrollment.COURSE_NOT_FOUND:
         return jsonify({'message': 'Course not found'}), 404
 
-    if course.is_premium == True and user.plan_type != 'premium':
+    if result == enrollment.SUBSCRIBERS_ONLY:
         return jsonify({'message': 'For subscribers only'}), 403
-    
-    enrollment = Enrollment(user_id=user.id, course_id=course_id)
-    db.session.add(enrollment)
-    db.session.commit()
+
+    if result == enrollment.ALREADY_ENROLLED:
+        return jsonify({'message': 'User already enrolled'}), 400
+
+    response_cache.invalidate(f'course:{course_id}', f'user:{current_user.id}:enrollments')
     return jsonify({'message': 'Enrollment completed'}), 201
 
 @course_bp.route('/my-courses', methods=["GET"])
 @jwt_required()
 def get_myCourses():
-    currentUser = get_jwt_identity()
-    user = db.session.get(User, currentUser)
+    limit = request.args.get('limit', COURSES_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor', type=int)
 
-    if not user:
-        return jsonify({'message': 'User not found'}), 404
-    
-    list_enrollments = []
-    for enrollment in user.enrollments:
-        content_data = {
-            'id': enrollment.id,
-            'course_id': enrollment.course_id,
-            'title': enrollment.course.title,
-            'category': enrollment.course.category.name
-        }
-        list_enrollments.append(content_data)
-    return jsonify(list_enrollments)
+    if limit < 1 or limit > COURSES_MAX_PAGE_SIZE:
+        return jsonify({'message': 'Invalid limit'}), 400
+
+    user_id = current_user.id
+    query = user_enrollments(user_id, cursor)
+
+    if wants_stream():
+        return stream_rows(query)
+
+    def build():
+        rows = db.session.execute(query.limit(limit + 1)).all()
+
+        courses_list = as_dicts(rows[:limit])
+        tags = [f'user:{user_id}:enrollments'] + [f'course:{course["course_id"]}' for course in courses_list]
+
+        # the total comes from the user's counter, not from counting the enrollments
+        response = jsonify(courses_list)
+        response.headers['X-Total-Count'] = str(db.session.execute(user_enrollment_count(user_id)).scalar() or 0)
+        if len(rows) > limit:
+            response.headers['X-Next-Cursor'] = str(courses_list[-1]['id'])
+        return response, 200, tags
+
+    return response_cache.respond(f'my-courses:{user_id}:{limit}:{cursor}', build)
+
+@course_bp.cli.command('recount', help='Recompute the denormalized course and category counters.')
+def recount_command():
+    fixed_courses, fixed_categories, fixed_users = counters.recount()
+    click.echo(f'{fixed_courses} courses, {fixed_categories} categories and {fixed_users} users fixed')
@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+import click
+from database import use_replica
+from serializers import as_dicts
+from services import search
+
+search_bp = Blueprint('search', __name__)
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+
+@search_bp.route('/search', methods=["GET"])
+@use_replica
+def search_catalog():
+    q = request.args.get('q', '')
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor', 0, type=int)
+
+    if not search.terms(q):
+        return jsonify({'message': 'Invalid query'}), 400
+
+    if limit < 1 or limit > SEARCH_MAX_PAGE_SIZE:
+        return jsonify({'message': 'Invalid limit'}), 400
+
+    if cursor < 0:
+        return jsonify({'message': 'Invalid cursor'}), 400
+
+    # results are ranked, so the cursor is the offset of the next page
+    rows = search.search(q, limit + 1, cursor)
+
+    response = jsonify(as_dicts(rows[:limit]))
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = str(cursor + limit)
+    return response, 200
+
+@search_bp.cli.command('rebuild', help='Rebuild the SQLite full-text index from the course and video tables.')
+def rebuild_command():
+    if search.rebuild():
+        click.echo('Search index rebuilt')
+    else:
+        click.echo('Nothing to rebuild, the search columns are maintained by the database')
@@ -1,30 +1,25 @@
-from extensions import db
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from models import User, Course, Video
-import re
+from extensions import db, response_cache
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import current_user, jwt_required
+from authz import admin_required
+from database import use_replica
+from models import Course, Video, VideoProgress
+from serializers import video_details
+from services import counters, progress
+from services.idempotency import idempotent
+from video_urls import format_url, normalize_many
+from sqlalchemy.exc import IntegrityError
+import click
+import json
 
 video_bp = Blueprint('video', __name__)
 
-def format_url(url):
-    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url)
-
-    if match:
-        video_id = match.group(1)
-        return f"https://www.youtube.com/embed/{video_id}?modestbranding=1&rel=0"
-    
-    return url
-
 @video_bp.route('/videos/add', methods=["POST"])
-@jwt_required()
+@admin_required
+@idempotent
 def add_video():
     data = request.json
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not 'title' in data or not 'url' in data or not 'course_id' in data:
         return jsonify({'message': 'Invalid data'}), 400
     
@@ -38,24 +33,141 @@ def add_video():
 
         video = Video(title=data['title'], resume=data.get('resume', ''), url=formatted_url, course_id=data['course_id'])
         db.session.add(video)
+        counters.add_videos(video.course_id)
         db.session.commit()
+        response_cache.invalidate(f'course:{video.course_id}')
         return jsonify({'message': 'Video successfully added'}), 201
     return jsonify({'message': 'Invalid title or url'}), 400
 
+def parse_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def import_videos(entries, batch_size):
+    errors = []
+    rows = []
+
+    for index, data in enumerate(entries):
+        if not isinstance(data, dict) or not 'title' in data or not 'url' in data or not 'course_id' in data:
+            errors.append({'index': index, 'message': 'Invalid data'})
+            continue
+
+        if not isinstance(data['title'], str) or not isinstance(data['url'], str) or not data['title'].strip() or not data['url'].strip():
+            errors.append({'index': index, 'message': 'Invalid title or url'})
+            continue
+
+        try:
+            course_id = int(data['course_id'])
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'message': 'Invalid course_id'})
+            continue
+
+        rows.append((index, {
+            'title': data['title'],
+            'resume': data.get('resume', ''),
+            'url': data['url'],
+            'course_id': course_id
+        }))
+
+    for (_, row), url in zip(rows, normalize_many([row['url'] for _, row in rows])):
+        row['url'] = url
+
+    course_ids = list({row['course_id'] for _, row in rows})
+    urls = list({row['url'] for _, row in rows})
+    existing_courses = set()
+    existing_urls = set()
+
+    for batch in chunks(course_ids, batch_size):
+        existing_courses.update(db.session.execute(db.select(Course.id).where(Course.id.in_(batch))).scalars())
+
+    for batch in chunks(urls, batch_size):
+        existing_urls.update(db.session.execute(db.select(Video.url).where(Video.url.in_(batch))).scalars())
+
+    videos = []
+    for index, row in rows:
+        if row['course_id'] not in existing_courses:
+            errors.append({'index': index, 'message': 'The course mentioned in this video does not exist.'})
+        elif row['url'] in existing_urls:
+            errors.append({'index': index, 'message': 'Video url already exist'})
+        else:
+            existing_urls.add(row['url'])
+            videos.append(row)
+
+    added = {}
+    for row in videos:
+        added[row['course_id']] = added.get(row['course_id'], 0) + 1
+
+    try:
+        for batch in chunks(videos, batch_size):
+            db.session.execute(db.insert(Video), batch)
+        counters.add_videos_many(added)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise
+
+    response_cache.invalidate(*[f'course:{course_id}' for course_id in added])
+    errors.sort(key=lambda error: error['index'])
+    return len(videos), errors
+
+@video_bp.route('/videos/bulk', methods=["POST"])
+@admin_required
+def add_videos_bulk():
+    batch_size = request.args.get('batch_size', current_app.config['VIDEO_IMPORT_BATCH_SIZE'], type=int)
+
+    if batch_size < 1:
+        return jsonify({'message': 'Invalid batch_size'}), 400
+
+    if request.mimetype == 'application/x-ndjson':
+        entries = parse_ndjson(request.stream)
+    else:
+        entries = request.get_json(silent=True)
+        if not isinstance(entries, list):
+            return jsonify({'message': 'Invalid data'}), 400
+
+    try:
+        created, errors = import_videos(entries, batch_size)
+    except IntegrityError:
+        return jsonify({'message': 'Videos changed during the import, try again'}), 409
+
+    return jsonify({'created': created, 'errors': errors}), 201 if created else 400
+
+@video_bp.cli.command('import')
+@click.argument('file', type=click.File())
+@click.option('--batch-size', type=int, default=None)
+def import_videos_command(file, batch_size):
+    content = file.read()
+
+    if content.lstrip().startswith('['):
+        entries = json.loads(content)
+    else:
+        entries = parse_ndjson(content.splitlines())
+
+    created, errors = import_videos(entries, batch_size or current_app.config['VIDEO_IMPORT_BATCH_SIZE'])
+
+    for error in errors:
+        click.echo(f"{error['index']}: {error['message']}", err=True)
+    click.echo(f'{created} videos imported, {len(errors)} errors')
+
 @video_bp.route('/videos/<int:video_id>/update', methods=["PUT"])
-@jwt_required()
+@admin_required
 def update_video(video_id):
     video = db.session.get(Video, video_id)
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not video:
         return jsonify({'message': 'Video not found'}), 404
     
     data = request.json
+    old_course_id = video.course_id
 
     if 'title' in data:
         if not data['title'].strip():
@@ -82,38 +194,55 @@ def update_video(video_id):
         else:
             video.course_id = data['course_id']
     
+    if video.course_id != old_course_id:
+        counters.add_videos(old_course_id, -1)
+        counters.add_videos(video.course_id)
+
     db.session.commit()
+    response_cache.invalidate(f'course:{old_course_id}', f'course:{video.course_id}')
     return jsonify({'message': 'Video successfully updated'}), 200
 
 @video_bp.route('/videos/<int:video_id>/delete', methods=["DELETE"])
-@jwt_required()
+@admin_required
 def delete_video(video_id):
     video = db.session.get(Video, video_id)
 
-    current_user = get_jwt_identity()
-    user = db.session.get(User, current_user)
-    if user.role != 'admin':
-        return jsonify({'message': 'Without permission'}), 403
-
     if not video:
         return jsonify({'message': 'Video not found'}), 404
     
+    # SQLite only cascades with foreign keys enabled
+    db.session.execute(db.delete(VideoProgress).where(VideoProgress.video_id == video_id))
     db.session.delete(video)
+    counters.add_videos(video.course_id, -1)
     db.session.commit()
+    response_cache.invalidate(f'course:{video.course_id}')
     return jsonify({'message': 'Video successfully deleted'}), 200
 
+@video_bp.route('/videos/<int:video_id>/progress', methods=["POST"])
+@jwt_required()
+def record_progress(video_id):
+    data = request.get_json(silent=True) or {}
+    position = data.get('position')
+    duration = data.get('duration')
+
+    if not isinstance(position, (int, float)) or isinstance(position, bool) or position < 0:
+        return jsonify({'message': 'Invalid position'}), 400
+
+    if duration is not None and (not isinstance(duration, (int, float)) or isinstance(duration, bool) or duration <= 0):
+        return jsonify({'message': 'Invalid duration'}), 400
+
+    # buffered and written in bulk, see services/progress.py
+    completed = duration is not None and position >= duration * progress.COMPLETED_AT
+    progress.buffer.record(current_user.id, video_id, int(position), completed)
+    return jsonify({'message': 'Progress recorded'}), 202
+
 @video_bp.route('/videos/<int:video_id>', methods=["GET"])
 @jwt_required()
+@use_replica
 def view_video(video_id):
-    video = db.session.get(Video, video_id)
+    video = db.session.execute(video_details(video_id)).first()
 
     if not video:
         return jsonify({'message': 'Video not found'}), 404
     
-    return jsonify({
-        'id': video.id,
-        'title': video.title,
-        'url': video.url,
-        'resume': video.resume,
-        'course_id': video.course_id
-    }), 200
\ No newline at end of file
+    return jsonify(video._asdict()), 200
\ No newline at end of file
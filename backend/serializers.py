@@ -0,0 +1,116 @@
+from flask.json.provider import DefaultJSONProvider
+from extensions import db
+from models import Category, Course, Enrollment, User, Video, VideoProgress
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Projections select only the columns a response needs. Their Row results
+# are lightweight named tuples, so no ORM entity is hydrated on read paths.
+
+def categories():
+    return db.select(Category.id, Category.name).order_by(Category.id)
+
+def teachers():
+    return db.select(User.id, User.username).where(User.role == 'admin').order_by(User.id)
+
+def course_summaries():
+    return db.select(Course.id, Course.title, Category.name.label('category'), Course.video_count, Course.enrollment_count).join(
+        Category, Course.category_id == Category.id
+    )
+
+def course_page(cursor=None, category_id=None, is_premium=None):
+    query = course_summaries()
+
+    if cursor is not None:
+        query = query.where(Course.id > cursor)
+
+    if category_id is not None:
+        query = query.where(Course.category_id == category_id)
+
+    if is_premium is True:
+        query = query.where(Course.is_premium == True)
+    elif is_premium is False:
+        query = query.where(db.or_(Course.is_premium == False, Course.is_premium.is_(None)))
+
+    return query.order_by(Course.id)
+
+def course_details_select(user_id):
+    is_enrolled = db.select(Enrollment.id).where((Enrollment.user_id == user_id) & (Enrollment.course_id == Course.id)).exists()
+    completed_videos = db.select(db.func.count(VideoProgress.id)).join(Video, VideoProgress.video_id == Video.id).where(
+        (VideoProgress.user_id == user_id) & (Video.course_id == Course.id) & VideoProgress.completed
+    ).scalar_subquery()
+    return db.select(
+        Course.id, Course.title, Course.description, User.username.label('teacher'),
+        Category.name.label('category'), is_enrolled.label('is_enrolled'), Course.is_premium,
+        Course.video_count, Course.enrollment_count, Course.updated_at, completed_videos.label('completed_videos')
+    ).join(User, Course.teacher_id == User.id).join(Category, Course.category_id == Category.id)
+
+def course_details(course_id, user_id):
+    return course_details_select(user_id).where(Course.id == course_id)
+
+def course_details_many(course_ids, user_id):
+    return course_details_select(user_id).where(Course.id.in_(course_ids))
+
+def course_videos(course_id):
+    return db.select(Video.id, Video.title, Video.url, Video.resume).where(Video.course_id == course_id).order_by(Video.id)
+
+def course_videos_many(course_ids):
+    return db.select(Video.course_id, Video.id, Video.title, Video.url, Video.resume).where(
+        Video.course_id.in_(course_ids)
+    ).order_by(Video.course_id, Video.id)
+
+def video_details(video_id):
+    return db.select(Video.id, Video.title, Video.url, Video.resume, Video.course_id).where(Video.id == video_id)
+
+def user_enrollments(user_id, cursor=None):
+    query = db.select(Enrollment.id, Enrollment.course_id, Course.title, Category.name.label('category')).join(
+        Course, Enrollment.course_id == Course.id
+    ).join(Category, Course.category_id == Category.id).where(Enrollment.user_id == user_id)
+
+    if cursor is not None:
+        query = query.where(Enrollment.id > cursor)
+
+    return query.order_by(Enrollment.id)
+
+def user_enrollment_count(user_id):
+    return db.select(User.enrollment_count).where(User.id == user_id)
+
+def completion(completed_videos, video_count):
+    # percentage of the course's videos the user has completed
+    return min(100, round(100 * completed_videos / video_count)) if video_count else 0
+
+def as_dict(row):
+    return row._asdict()
+
+def as_dicts(rows):
+    return [row._asdict() for row in rows]
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Same output as the default provider (sorted keys, http dates), encoded
+    # by orjson. Calls with extra json.dumps options use the stdlib path.
+
+    def _options(self):
+        options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+JSONProvider = OrjsonProvider if orjson else DefaultJSONProvider
@@ -0,0 +1,418 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from itertools import islice
+from types import MappingProxyType
+
+import click
+from flask import Response, request
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect
+
+from authz import create_user_token
+from database import RoutingSession
+from extensions import db
+from metrics import log_event
+from models import Category, Course, User, Video
+
+log = logging.getLogger(__name__)
+
+# The catalog (categories -> courses -> video counts) is read far more often
+# than it changes, so GET /categories and GET /courses are served from an
+# in-memory snapshot instead of the tables. A snapshot is never modified:
+# a commit that touched catalog rows builds a new one that shares all the
+# parts it didn't touch, and swapping it in is a single assignment, so a
+# reader always sees one consistent version.
+#
+# Commits only queue the ids they touched; the next read applies the queue
+# with one query before it is served, so writes don't pay for it and a burst
+# of them is applied at once. Each worker has its own snapshot: its own
+# commits are seen by the next read, the other workers' ones at the latest
+# after a full rebuild, which happens when the snapshot is older than
+# CATALOG_MAX_AGE seconds.
+
+# courses are split in chunks of 1024 ids, so an update only copies the
+# chunks it touches instead of the whole catalog
+CHUNK_BITS = 10
+
+CategoryEntry = namedtuple('CategoryEntry', ['id', 'name', 'course_ids'])
+CourseEntry = namedtuple('CourseEntry', ['id', 'title', 'category_id', 'category', 'is_premium', 'video_count', 'enrollment_count', 'body'])
+Snapshot = namedtuple('Snapshot', ['version', 'built_at', 'categories', 'categories_body', 'chunks', 'course_ids', 'premium_ids'])
+
+def encode(value):
+    # sorted keys and compact, like jsonify
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+
+def course_entry(row):
+    body = encode({'id': row.id, 'title': row.title, 'category': row.category, 'video_count': row.video_count, 'enrollment_count': row.enrollment_count})
+    return CourseEntry(row.id, row.title, row.category_id, row.category, bool(row.is_premium), row.video_count, row.enrollment_count, body)
+
+def course_rows():
+    return db.select(
+        Course.id, Course.title, Course.category_id, Category.name.label('category'), Course.is_premium, Course.video_count, Course.enrollment_count
+    ).join(Category, Course.category_id == Category.id).order_by(Course.id)
+
+def categories_body(categories):
+    if not categories:
+        return None
+    return b'[' + b','.join(encode({'id': category.id, 'name': category.name}) for _, category in sorted(categories.items())) + b']\n'
+
+def freeze(chunks):
+    return MappingProxyType({number: MappingProxyType(chunk) for number, chunk in chunks.items()})
+
+def build(connection, version):
+    categories = {row.id: row.name for row in connection.execute(db.select(Category.id, Category.name))}
+    chunks = {}
+    category_courses = {category_id: [] for category_id in categories}
+    course_ids = []
+    premium_ids = []
+
+    for row in connection.execute(course_rows()):
+        entry = course_entry(row)
+        chunks.setdefault(entry.id >> CHUNK_BITS, {})[entry.id] = entry
+        category_courses[entry.category_id].append(entry.id)
+        course_ids.append(entry.id)
+        if entry.is_premium:
+            premium_ids.append(entry.id)
+
+    categories = {category_id: CategoryEntry(category_id, name, tuple(category_courses[category_id])) for category_id, name in categories.items()}
+    return Snapshot(
+        version, time.monotonic(), MappingProxyType(categories), categories_body(categories), freeze(chunks), tuple(course_ids), tuple(premium_ids)
+    )
+
+def course(snapshot, course_id):
+    chunk = snapshot.chunks.get(course_id >> CHUNK_BITS)
+    return chunk.get(course_id) if chunk is not None else None
+
+def updated_ids(ids, removed, added):
+    if not removed and not added:
+        return ids
+
+    ids = list(ids)
+    for course_id in removed:
+        index = bisect_left(ids, course_id)
+        if index < len(ids) and ids[index] == course_id:
+            del ids[index]
+    for course_id in added:
+        insort(ids, course_id)
+    return tuple(ids)
+
+def update(snapshot, connection, course_ids, category_ids, version):
+    # Rows are read back from the database rather than replayed from the
+    # write, so the result is the committed state whatever the write did.
+    categories = {}
+    if category_ids:
+        categories = {row.id: row.name for row in connection.execute(db.select(Category.id, Category.name).where(Category.id.in_(category_ids)))}
+
+    # a renamed category changes the body of every one of its courses
+    course_ids = set(course_ids)
+    for category_id, name in categories.items():
+        old = snapshot.categories.get(category_id)
+        if old is not None and old.name != name:
+            course_ids.update(old.course_ids)
+
+    rows = {row.id: row for row in connection.execute(course_rows().where(Course.id.in_(course_ids)))} if course_ids else {}
+
+    chunks = {}
+    removed, added = set(), set()
+    premium_removed, premium_added = set(), set()
+    category_changes = {}
+
+    for course_id in course_ids:
+        old = course(snapshot, course_id)
+        new = course_entry(rows[course_id]) if course_id in rows else None
+        if old is None and new is None:
+            continue
+
+        number = course_id >> CHUNK_BITS
+        if number not in chunks:
+            chunks[number] = dict(snapshot.chunks.get(number, {}))
+        if new is None:
+            del chunks[number][course_id]
+            removed.add(course_id)
+        else:
+            chunks[number][course_id] = new
+            if old is None:
+                added.add(course_id)
+
+        if (old is not None and old.is_premium) and not (new is not None and new.is_premium):
+            premium_removed.add(course_id)
+        elif (new is not None and new.is_premium) and not (old is not None and old.is_premium):
+            premium_added.add(course_id)
+
+        old_category = old.category_id if old is not None else None
+        new_category = new.category_id if new is not None else None
+        if old_category != new_category:
+            if old_category is not None:
+                category_changes.setdefault(old_category, (set(), set()))[0].add(course_id)
+            if new_category is not None:
+                category_changes.setdefault(new_category, (set(), set()))[1].add(course_id)
+                categories.setdefault(new_category, new.category)
+
+    all_categories = dict(snapshot.categories)
+    for category_id in set(category_ids) | set(category_changes):
+        old = snapshot.categories.get(category_id)
+        if category_id in categories:
+            name = categories[category_id]
+        elif category_id not in category_ids and old is not None:
+            name = old.name
+        else:
+            all_categories.pop(category_id, None)
+            continue
+
+        category_removed, category_added = category_changes.get(category_id, ((), ()))
+        ids = updated_ids(old.course_ids if old is not None else (), category_removed, category_added)
+        all_categories[category_id] = CategoryEntry(category_id, name, ids)
+
+    changed_categories = all_categories != dict(snapshot.categories)
+    all_chunks = dict(snapshot.chunks)
+    for number, chunk in chunks.items():
+        if chunk:
+            all_chunks[number] = MappingProxyType(chunk)
+        else:
+            del all_chunks[number]
+
+    return Snapshot(
+        version, snapshot.built_at,
+        MappingProxyType(all_categories) if changed_categories else snapshot.categories,
+        categories_body(all_categories) if changed_categories else snapshot.categories_body,
+        MappingProxyType(all_chunks), updated_ids(snapshot.course_ids, removed, added),
+        updated_ids(snapshot.premium_ids, premium_removed, premium_added)
+    )
+
+def as_dict(entry):
+    if entry is None:
+        return None
+    entry = entry._asdict()
+    if 'body' in entry:
+        entry['body'] = entry['body'].decode()
+    return entry
+
+def diff(snapshot, fresh):
+    differences = []
+
+    for category_id in sorted(set(snapshot.categories) | set(fresh.categories)):
+        old, new = snapshot.categories.get(category_id), fresh.categories.get(category_id)
+        if old != new:
+            differences.append({'category': category_id, 'snapshot': as_dict(old), 'database': as_dict(new)})
+
+    for course_id in sorted(set(snapshot.course_ids) | set(fresh.course_ids)):
+        old, new = course(snapshot, course_id), course(fresh, course_id)
+        if old != new:
+            differences.append({'course': course_id, 'snapshot': as_dict(old), 'database': as_dict(new)})
+
+    # the id lists are maintained separately from the entries
+    for name in ('course_ids', 'premium_ids'):
+        if getattr(snapshot, name) != getattr(fresh, name):
+            differences.append({'index': name})
+    if snapshot.categories_body != fresh.categories_body:
+        differences.append({'index': 'categories_body'})
+
+    return differences
+
+
+class CatalogStore:
+    # The snapshot is read from the primary, also for the @use_replica views
+    # that serve it: every commit is applied right after it lands, which a
+    # lagging replica could miss until the next full rebuild. Only the
+    # streamed (?stream=1) variants of those views read the replica.
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_age = 60
+        self.current = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_MAX_AGE', 60)
+
+        self.app = app
+        self.max_age = app.config['CATALOG_MAX_AGE']
+        self.current = None
+        app.extensions['catalog'] = self
+
+        if not event.contains(RoutingSession, 'after_flush', track_flush):
+            event.listen(RoutingSession, 'after_flush', track_flush)
+            event.listen(RoutingSession, 'after_commit', apply_changes)
+            event.listen(RoutingSession, 'after_rollback', discard_changes)
+
+    def _next_version(self):
+        self._version += 1
+        return self._version
+
+    def _take_pending(self):
+        # Taken before the database is read: whatever was queued until now
+        # committed earlier and is in what the read sees, later commits stay
+        # queued for the next one.
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        return pending
+
+    def _rebuild(self):
+        self._take_pending()
+        with db.engine.connect() as connection:
+            self.current = build(connection, self._next_version())
+        return self.current
+
+    def _refresh(self):
+        pending = self._take_pending()
+        if pending is None or self.current is None:
+            return self.current or self._rebuild()
+
+        courses, categories, everything = pending
+        if everything:
+            return self._rebuild()
+
+        try:
+            with db.engine.connect() as connection:
+                self.current = update(self.current, connection, courses, categories, self._next_version())
+        except Exception:
+            # the queue is gone, so only a full rebuild can catch up
+            self.current = None
+            log_event(log, 'catalog_update_failed', level=logging.ERROR, courses=len(courses), categories=len(categories))
+            raise
+        return self.current
+
+    def snapshot(self):
+        # Built on first use rather than at startup, so CLI commands like
+        # 'flask db upgrade' never need the tables.
+        snapshot = self.current
+        if snapshot is None or self._pending is not None:
+            with self._lock:
+                return self._refresh()
+
+        # only one reader rebuilds a stale snapshot, the others keep using it
+        if time.monotonic() - snapshot.built_at > self.max_age and self._lock.acquire(blocking=False):
+            try:
+                return self._rebuild()
+            finally:
+                self._lock.release()
+        return snapshot
+
+    def apply(self, course_ids, category_ids, everything=False):
+        # Queued even before the first build: one may be reading the tables
+        # right now and miss this commit. Rebuilds clear the queue anyway.
+        with self._pending_lock:
+            courses, categories, pending_everything = self._pending or (set(), set(), False)
+            self._pending = (courses | course_ids, categories | category_ids, pending_everything or everything)
+
+    def check(self):
+        with self._lock:
+            snapshot = self._refresh() if self.current is not None else None
+            with db.engine.connect() as connection:
+                fresh = build(connection, self._next_version())
+
+            differences = diff(snapshot, fresh) if snapshot is not None else []
+            if differences:
+                log_event(log, 'catalog_drift', level=logging.WARNING, version=snapshot.version, differences=len(differences))
+            self.current = fresh
+        return snapshot.version if snapshot is not None else None, differences
+
+    def categories(self):
+        return self.snapshot().categories_body
+
+    def courses(self, cursor=None, limit=50, category_id=None, is_premium=None):
+        # (body, next cursor) for a page of course summaries, same order and
+        # filters as serializers.course_page
+        snapshot = self.snapshot()
+
+        if category_id is not None:
+            category = snapshot.categories.get(category_id)
+            ids = category.course_ids if category is not None else ()
+        elif is_premium is True:
+            ids = snapshot.premium_ids
+            is_premium = None
+        else:
+            ids = snapshot.course_ids
+
+        start = bisect_right(ids, cursor) if cursor is not None else 0
+        entries = []
+        for course_id in islice(ids, start, None):
+            entry = course(snapshot, course_id)
+            if is_premium is not None and entry.is_premium != is_premium:
+                continue
+            entries.append(entry)
+            if len(entries) > limit:
+                break
+
+        body = b'[' + b','.join(entry.body for entry in entries[:limit]) + b']\n'
+        return body, entries[limit - 1].id if len(entries) > limit else None
+
+def respond(body, headers=None):
+    response = Response(body, headers=headers, mimetype='application/json')
+    response.set_etag(hashlib.sha1(body).hexdigest())
+    return response.make_conditional(request)
+
+# Writes are collected per session and applied once the transaction has
+# committed. ORM changes are picked up at flush; bulk statements (the
+# counters, Core deletes) report what they touched with changed().
+
+def changes(session):
+    return session.info.setdefault('catalog_changes', {'courses': set(), 'categories': set(), 'everything': False})
+
+def ids(values):
+    # Views may pass ids as the client sent them ("1"); the snapshot is keyed
+    # by int, and a str queued here would only fail at the next read.
+    return {int(value) for value in values if value is not None}
+
+def changed(courses=(), categories=(), everything=False):
+    pending = changes(db.session())
+    pending['courses'].update(ids(courses))
+    pending['categories'].update(ids(categories))
+    pending['everything'] = pending['everything'] or everything
+
+def track_flush(session, flush_context):
+    pending = None
+
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Course):
+            pending = pending or changes(session)
+            pending['courses'].update(ids([instance.id]))
+            # moving a course to another category changes both categories
+            pending['categories'].update(ids(inspect(instance).attrs.category_id.history.deleted))
+        elif isinstance(instance, Category):
+            pending = pending or changes(session)
+            pending['categories'].update(ids([instance.id]))
+        elif isinstance(instance, Video):
+            pending = pending or changes(session)
+            pending['courses'].update(ids([instance.course_id, *inspect(instance).attrs.course_id.history.deleted]))
+
+def apply_changes(session):
+    pending = session.info.pop('catalog_changes', None)
+    if pending and (pending['courses'] or pending['categories'] or pending['everything']):
+        store.apply(pending['courses'], pending['categories'], pending['everything'])
+
+def discard_changes(session):
+    session.info.pop('catalog_changes', None)
+
+store = CatalogStore()
+
+catalog_cli = AppGroup('catalog', help='Inspect the in-memory catalog snapshot.')
+
+@catalog_cli.command('check', help="Diff a running server's catalog snapshot against the database.")
+@click.option('--url', default='http://127.0.0.1:5000', help='Base URL of the server; the worker that answers is the one checked.')
+def check_command(url):
+    admin = db.session.execute(db.select(User.id, User.role, User.plan_type).where(User.role == 'admin').order_by(User.id)).first()
+    if not admin:
+        raise click.ClickException('No admin user to sign the request with.')
+
+    from urllib.request import Request, urlopen
+
+    check = Request(f'{url.rstrip("/")}/catalog/check', headers={'Authorization': f'Bearer {create_user_token(admin)}'})
+    with urlopen(check, timeout=30) as response:
+        result = json.load(response)
+
+    for difference in result['differences']:
+        click.echo(json.dumps(difference, sort_keys=True))
+    click.echo(f'snapshot version {result["version"]}: {len(result["differences"])} differences')
+    if result['differences']:
+        raise SystemExit(1)
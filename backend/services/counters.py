@@ -0,0 +1,57 @@
+from extensions import db
+from models import Category, Course, Enrollment, User, Video
+from services import catalog
+
+# Counters are changed with relative UPDATEs inside the caller's
+# transaction, so they commit or roll back together with the write that
+# caused them. 'flask course recount' repairs any drift.
+
+def add_videos(course_id, amount=1):
+    db.session.execute(db.update(Course).where(Course.id == course_id).values(video_count=Course.video_count + amount))
+    catalog.changed(courses=[course_id])
+
+def add_videos_many(amounts, batch_size=500):
+    # {course_id: amount} for a whole import, one UPDATE per batch of courses
+    items = list(amounts.items())
+    for start in range(0, len(items), batch_size):
+        batch = dict(items[start:start + batch_size])
+        db.session.execute(db.update(Course).where(Course.id.in_(batch)).values(
+            video_count=Course.video_count + db.case(batch, value=Course.id, else_=0)
+        ))
+    catalog.changed(courses=amounts)
+
+def add_enrollments(course_id, amount=1):
+    # enrollments are not a content change, keep updated_at as it is
+    db.session.execute(db.update(Course).where(Course.id == course_id).values(
+        enrollment_count=Course.enrollment_count + amount, updated_at=Course.updated_at
+    ))
+    catalog.changed(courses=[course_id])
+
+def add_user_enrollments(user_id, amount=1):
+    db.session.execute(db.update(User).where(User.id == user_id).values(enrollment_count=User.enrollment_count + amount))
+
+def add_courses(category_id, amount=1):
+    db.session.execute(db.update(Category).where(Category.id == category_id).values(course_count=Category.course_count + amount))
+
+def recount():
+    videos = db.select(db.func.count(Video.id)).where(Video.course_id == Course.id).scalar_subquery()
+    enrollments = db.select(db.func.count(Enrollment.id)).where(Enrollment.course_id == Course.id).scalar_subquery()
+    courses = db.select(db.func.count(Course.id)).where(Course.category_id == Category.id).scalar_subquery()
+    user_enrollments = db.select(db.func.count(Enrollment.id)).where(Enrollment.user_id == User.id).scalar_subquery()
+
+    fixed_courses = db.session.execute(
+        db.update(Course).where((Course.video_count != videos) | (Course.enrollment_count != enrollments)).values(
+            video_count=videos, enrollment_count=enrollments, updated_at=Course.updated_at
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    fixed_categories = db.session.execute(
+        db.update(Category).where(Category.course_count != courses).values(course_count=courses).execution_options(synchronize_session=False)
+    ).rowcount
+
+    fixed_users = db.session.execute(
+        db.update(User).where(User.enrollment_count != user_enrollments).values(enrollment_count=user_enrollments).execution_options(synchronize_session=False)
+    ).rowcount
+
+    catalog.changed(everything=fixed_courses > 0)
+    db.session.commit()
+    return fixed_courses, fixed_categories, fixed_users
@@ -0,0 +1,44 @@
+from flask import jsonify, make_response
+from sqlalchemy import event, inspect
+from database import RoutingSession
+from extensions import db, response_cache
+from models import User
+from serializers import as_dicts, teachers
+
+# The teacher directory is read on every course form and only changes when
+# a user is created or changes role. It is kept in the response cache under
+# one tag, so a form load is a cache hit, or a 304 when the client sends the
+# ETag back.
+
+TAG = 'teachers'
+
+def respond():
+    response = make_response(response_cache.respond(TAG, build))
+    if response.status_code in (200, 304):
+        # browsers revalidate on every load instead of guessing a lifetime
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def build():
+    teacher_list = as_dicts(db.session.execute(teachers()))
+
+    if not teacher_list:
+        return jsonify({'message': 'Teachers not found'}), 404, []
+
+    return jsonify(teacher_list), 200, [TAG]
+
+@event.listens_for(RoutingSession, 'after_flush')
+def track_users(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, User) and (instance not in session.dirty or inspect(instance).attrs.role.history.has_changes()):
+            session.info['teachers_changed'] = True
+            return
+
+@event.listens_for(RoutingSession, 'after_commit')
+def invalidate(session):
+    if session.info.pop('teachers_changed', False):
+        response_cache.invalidate(TAG)
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard(session):
+    session.info.pop('teachers_changed', None)
@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from services import counters
+from models import Course, Enrollment, User
+
+CREATED = 'created'
+ALREADY_ENROLLED = 'already_enrolled'
+COURSE_NOT_FOUND = 'course_not_found'
+SUBSCRIBERS_ONLY = 'subscribers_only'
+
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+def enroll(user_id, course_id):
+    # The premium check and the insert run as one INSERT ... SELECT, so the
+    # common path is a single round trip and concurrent requests for the
+    # same pair can only ever create one row.
+    eligible = db.select(
+        db.literal(user_id), Course.id, db.literal(datetime.utcnow(), db.DateTime)
+    ).select_from(Course).join(User, User.id == user_id).where(
+        (Course.id == course_id) & db.or_(Course.is_premium.is_not(True), User.plan_type == 'premium')
+    )
+
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+    try:
+        if insert:
+            query = insert(Enrollment).from_select(['user_id', 'course_id', 'created_at'], eligible)
+            query = query.on_conflict_do_nothing(index_elements=['user_id', 'course_id'])
+            created = db.session.execute(query.returning(Enrollment.id)).first() is not None
+        else:
+            query = db.insert(Enrollment).from_select(['user_id', 'course_id', 'created_at'], eligible)
+            created = db.session.execute(query).rowcount > 0
+
+        if created:
+            counters.add_enrollments(course_id)
+            counters.add_user_enrollments(user_id)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        created = False
+
+    if created:
+        return CREATED
+
+    is_enrolled = db.select(Enrollment.id).where((Enrollment.user_id == user_id) & (Enrollment.course_id == Course.id)).exists()
+    course = db.session.execute(db.select(Course.id, is_enrolled).where(Course.id == course_id)).first()
+
+    if not course:
+        return COURSE_NOT_FOUND
+
+    if course[1]:
+        return ALREADY_ENROLLED
+
+    return SUBSCRIBERS_ONLY
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy.exc import IntegrityError
+
+from cache import LRUCache
+from extensions import db
+from models import IdempotencyKey
+from services.enrollment import UPSERT_INSERTS
+
+# how often a worker deletes expired keys, in seconds
+PURGE_INTERVAL = 60
+
+class IdempotencyStore:
+    # A request with an Idempotency-Key header claims the key by inserting
+    # its row before the view runs. Among parallel retries, in any worker,
+    # exactly one gets to run the view: the others get a 409 while it runs
+    # and its stored response once it is done. Finished responses are also
+    # kept in an LRU, so most replays don't touch the database at all.
+
+    def __init__(self, app=None):
+        self.ttl = 86400
+        self.lock_timeout = 30
+        self.responses = LRUCache(maxsize=4096, ttl=self.ttl)
+        self._purged_at = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDEMPOTENCY_TTL', 86400)
+        app.config.setdefault('IDEMPOTENCY_LOCK_TIMEOUT', 30)
+        app.config.setdefault('IDEMPOTENCY_CACHE_SIZE', 4096)
+
+        self.ttl = app.config['IDEMPOTENCY_TTL']
+        self.lock_timeout = app.config['IDEMPOTENCY_LOCK_TIMEOUT']
+        self.responses = LRUCache(maxsize=app.config['IDEMPOTENCY_CACHE_SIZE'], ttl=self.ttl)
+        app.extensions['idempotency'] = self
+
+    def run(self, key, view, args, kwargs):
+        # Keys are per client and endpoint, so two users (or two forms) can
+        # never see each other's responses.
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        client = f'user:{identity}' if identity is not None else f'ip:{request.remote_addr}'
+        digest = hashlib.sha256(f'{client}\n{request.endpoint}\n{key}'.encode()).hexdigest()
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        entry = self.responses.get(digest)
+        if entry is not None:
+            return replay(entry, request_hash)
+
+        for _ in range(2):
+            claimed, existing = self._claim(digest, request_hash)
+            if claimed:
+                return self._execute(digest, request_hash, view, args, kwargs)
+
+            if existing is not None and not self._abandoned(existing):
+                break
+
+            # expired, or left behind by a worker that died mid-request
+            if existing is not None:
+                self._release(digest, existing.created_at)
+        else:
+            return in_progress()
+
+        if existing.status is None:
+            return in_progress() if existing.request_hash == request_hash else mismatch()
+
+        entry = (existing.request_hash, existing.status, existing.body)
+        remaining = (existing.created_at + timedelta(seconds=self.ttl) - datetime.utcnow()).total_seconds()
+        self.responses.set(digest, entry, ttl=max(remaining, 1))
+        return replay(entry, request_hash)
+
+    def _abandoned(self, existing):
+        age = (datetime.utcnow() - existing.created_at).total_seconds()
+        return age > self.ttl or (existing.status is None and age > self.lock_timeout)
+
+    def _claim(self, digest, request_hash):
+        now = datetime.utcnow()
+        self._purge(now)
+
+        insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        values = {'key': digest, 'request_hash': request_hash, 'created_at': now}
+
+        if insert:
+            query = insert(IdempotencyKey).values(values).on_conflict_do_nothing(index_elements=['key'])
+            claimed = db.session.execute(query.returning(IdempotencyKey.key)).first() is not None
+            db.session.commit()
+        else:
+            try:
+                db.session.execute(db.insert(IdempotencyKey).values(values))
+                db.session.commit()
+                claimed = True
+            except IntegrityError:
+                db.session.rollback()
+                claimed = False
+
+        if claimed:
+            return True, None
+
+        existing = db.session.execute(db.select(
+            IdempotencyKey.request_hash, IdempotencyKey.status, IdempotencyKey.body, IdempotencyKey.created_at
+        ).where(IdempotencyKey.key == digest)).first()
+        db.session.commit()
+        return False, existing
+
+    def _execute(self, digest, request_hash, view, args, kwargs):
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            self._release(digest)
+            raise
+
+        # server errors and throttling are worth retrying, so the key is freed
+        if response.status_code >= 500 or response.status_code == 429:
+            self._release(digest)
+            return response
+
+        body = response.get_data()
+        db.session.execute(db.update(IdempotencyKey).where(IdempotencyKey.key == digest).values(status=response.status_code, body=body))
+        db.session.commit()
+        self.responses.set(digest, (request_hash, response.status_code, body))
+        return response
+
+    def _release(self, digest, created_at=None):
+        db.session.rollback()
+        query = db.delete(IdempotencyKey).where(IdempotencyKey.key == digest)
+        if created_at is not None:
+            # only the row that was looked at, not one a retry just claimed
+            query = query.where(IdempotencyKey.created_at == created_at)
+        db.session.execute(query)
+        db.session.commit()
+
+    def _purge(self, now):
+        if time.monotonic() - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = time.monotonic()
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.created_at < now - timedelta(seconds=self.ttl)))
+
+def replay(entry, request_hash):
+    stored_hash, status, body = entry
+    if stored_hash != request_hash:
+        return mismatch()
+    return Response(body, status=status, mimetype='application/json', headers={'Idempotent-Replayed': 'true'})
+
+def in_progress():
+    return jsonify({'message': 'A request with this Idempotency-Key is in progress'}), 409, {'Retry-After': '1'}
+
+def mismatch():
+    return jsonify({'message': 'Idempotency-Key was already used with a different request'}), 422
+
+store = IdempotencyStore()
+
+def idempotent(view):
+    # Goes under the auth decorator, so the key is only claimed for requests
+    # that are allowed to run the view.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+
+        if not key.strip() or len(key) > 255:
+            return jsonify({'message': 'Invalid Idempotency-Key'}), 400
+
+        return store.run(key, view, args, kwargs)
+    return wrapper
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class HashQueueFull(Exception):
+    pass
+
+class PasswordHasher:
+    # Hashing is CPU bound for tens of milliseconds, so it runs in a small
+    # process pool instead of the request thread. At most
+    # PASSWORD_HASH_QUEUE hashes can be pending; past that callers get
+    # HashQueueFull right away instead of waiting behind a login burst.
+
+    def __init__(self, app=None):
+        self.method = None
+        self.prefix = None
+        self.workers = 0
+        self.queue_size = 0
+        self.timeout = None
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_QUEUE', app.config['PASSWORD_HASH_WORKERS'] * 8)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 5)
+
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.prefix = None
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.queue_size = app.config['PASSWORD_HASH_QUEUE']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        app.extensions['password_hasher'] = self
+
+        # a pool built for earlier settings is replaced on first use
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _get_pool(self):
+        # Pools do not survive a fork, so every worker process builds its own.
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._slots = threading.BoundedSemaphore(self.queue_size)
+                self._pid = os.getpid()
+            return self._pool, self._slots
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        pool, slots = self._get_pool()
+        if not slots.acquire(blocking=False):
+            raise HashQueueFull()
+
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashQueueFull()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        # werkzeug expands shorthands ('pbkdf2:sha256' is stored as
+        # 'pbkdf2:sha256:1000000'), so compare with the prefix it really
+        # writes. Finding it costs a hash, paid on the first check rather
+        # than at every create_app().
+        if self.prefix is None:
+            self.prefix = self.hash('').split('$', 1)[0]
+        return stored_hash.split('$', 1)[0] != self.prefix
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db
+from metrics import log_event
+from models import Video, VideoProgress
+from services.enrollment import UPSERT_INSERTS
+
+# share of a video that has to be watched for it to count as completed
+COMPLETED_AT = 0.9
+
+log = logging.getLogger(__name__)
+
+class ProgressBuffer:
+    # Heartbeats are not written one by one. The buffer keeps the latest
+    # position per (user_id, video_id) and a background thread upserts
+    # everything pending every PROGRESS_FLUSH_INTERVAL seconds, or as soon
+    # as PROGRESS_FLUSH_SIZE entries are waiting. A crashed worker loses at
+    # most the last interval of progress.
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 5
+        self.size = 1000
+        self._flush_lock = threading.Lock()
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault('PROGRESS_FLUSH_INTERVAL', 5)
+        app.config.setdefault('PROGRESS_FLUSH_SIZE', 1000)
+
+        self.app = app
+        self.interval = app.config['PROGRESS_FLUSH_INTERVAL']
+        self.size = app.config['PROGRESS_FLUSH_SIZE']
+        app.extensions['progress_buffer'] = self
+
+    def record(self, user_id, video_id, position, completed):
+        if self._pid != os.getpid():
+            # forked worker: own buffer, own flush thread
+            self._reset()
+
+        key = (user_id, video_id)
+        with self._lock:
+            previous = self._pending.get(key)
+            self._pending[key] = (position, completed or (previous is not None and previous[1]), datetime.utcnow())
+            pending = len(self._pending)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+                self._thread.start()
+
+        if pending >= self.size:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # one flush at a time, so an older batch can't land after a newer one
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            if not pending:
+                return 0
+
+            rows = [
+                {'user_id': user_id, 'video_id': video_id, 'position': position, 'completed': completed, 'updated_at': updated_at}
+                for (user_id, video_id), (position, completed, updated_at) in pending.items()
+            ]
+
+            with self.app.app_context():
+                try:
+                    written = write(rows)
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    log_event(log, 'progress_flush_failed', level=logging.ERROR, rows=len(rows))
+                    return 0
+            return written
+
+def write(rows, batch_size=500):
+    # Heartbeats aren't checked against the database when they arrive, so
+    # rows for videos that don't exist (anymore) are dropped here.
+    video_ids = list({row['video_id'] for row in rows})
+    existing = set()
+    for start in range(0, len(video_ids), batch_size):
+        existing.update(db.session.execute(db.select(Video.id).where(Video.id.in_(video_ids[start:start + batch_size]))).scalars())
+    rows = [row for row in rows if row['video_id'] in existing]
+
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+
+        if insert:
+            query = insert(VideoProgress).values(batch)
+            # another worker may already have written a newer heartbeat
+            query = query.on_conflict_do_update(
+                index_elements=['user_id', 'video_id'],
+                set_={
+                    'position': query.excluded.position,
+                    'completed': db.or_(VideoProgress.completed, query.excluded.completed),
+                    'updated_at': query.excluded.updated_at
+                },
+                where=VideoProgress.updated_at <= query.excluded.updated_at
+            )
+            db.session.execute(query)
+            continue
+
+        for row in batch:
+            updated = db.session.execute(db.update(VideoProgress).where(
+                (VideoProgress.user_id == row['user_id']) & (VideoProgress.video_id == row['video_id'])
+            ).values(
+                position=row['position'], completed=db.or_(VideoProgress.completed, row['completed']), updated_at=row['updated_at']
+            )).rowcount
+            if not updated:
+                db.session.execute(db.insert(VideoProgress), row)
+
+    return len(rows)
+
+buffer = ProgressBuffer()
+# once per process, not per app: it writes through whichever app is current
+atexit.register(buffer.flush)
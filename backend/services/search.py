@@ -0,0 +1,69 @@
+import re
+from extensions import db
+
+# Course and video text is indexed by the database: on Postgres a generated
+# tsvector column with a GIN index, on SQLite an external content FTS5
+# table kept in sync by triggers (migration 5a1e3c9d7f20). Every INSERT,
+# UPDATE or DELETE of a row updates its index entry in the same
+# transaction, so the write routes and the bulk import need no extra step.
+
+TERM = re.compile(r'\w+')
+MAX_TERMS = 8
+
+SQLITE_HITS = '''
+    SELECT 'course' AS type, course.id, course.title, course.id AS course_id, bm25(course_fts, 4.0, 1.0) AS score
+    FROM course_fts JOIN course ON course.id = course_fts.rowid
+    WHERE course_fts MATCH :query
+    UNION ALL
+    SELECT 'video', video.id, video.title, video.course_id, bm25(video_fts, 4.0, 1.0)
+    FROM video_fts JOIN video ON video.id = video_fts.rowid
+    WHERE video_fts MATCH :query
+'''
+
+POSTGRES_HITS = '''
+    SELECT 'course' AS type, course.id, course.title, course.id AS course_id, -ts_rank(course.search_vector, query) AS score
+    FROM course, to_tsquery('simple', :query) AS query
+    WHERE course.search_vector @@ query
+    UNION ALL
+    SELECT 'video', video.id, video.title, video.course_id, -ts_rank(video.search_vector, query)
+    FROM video, to_tsquery('simple', :query) AS query
+    WHERE video.search_vector @@ query
+'''
+
+def terms(q):
+    return TERM.findall(q.lower())[:MAX_TERMS]
+
+def match_query(dialect, words):
+    # The last word is matched as a prefix so results show up while typing.
+    # Only \w+ words get here, so user input can't break the query syntax.
+    if dialect == 'postgresql':
+        return ' & '.join(words) + ':*'
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+def search(q, limit, offset=0):
+    dialect = db.session.get_bind().dialect.name
+    hits = POSTGRES_HITS if dialect == 'postgresql' else SQLITE_HITS
+
+    query = db.text(
+        f'SELECT hit.type, hit.id, hit.title, hit.course_id FROM ({hits}) AS hit '
+        'ORDER BY hit.score, hit.type, hit.id LIMIT :limit OFFSET :offset'
+    )
+    return db.session.execute(query, {'query': match_query(dialect, terms(q)), 'limit': limit, 'offset': offset}).all()
+
+def rebuild():
+    # Only the FTS5 tables can drift (e.g. rows written with the triggers
+    # dropped); the Postgres columns are computed by the database.
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return False
+
+    db.session.execute(db.text("INSERT INTO course_fts(course_fts) VALUES ('rebuild')"))
+    db.session.execute(db.text("INSERT INTO video_fts(video_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return True
+
+def include_object(object, name, type_, reflected, compare_to):
+    # keeps 'flask db migrate' from dropping the search tables, columns and
+    # indexes, which are not part of the models
+    if reflected and compare_to is None:
+        return '_fts' not in name and 'search_vector' not in name
+    return True
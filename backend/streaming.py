@@ -0,0 +1,22 @@
+from flask import Response, current_app, request, stream_with_context
+from extensions import db
+from serializers import as_dict
+
+NDJSON = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+
+def wants_stream():
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+def stream_rows(query, serialize=as_dict, batch_size=STREAM_BATCH_SIZE):
+    # yield_per turns on server-side cursors where the driver supports them,
+    # so only one partition of rows and its encoded lines are held at a time.
+    def generate():
+        dumps = current_app.json.dumps
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield ''.join(dumps(serialize(row)) + '\n' for row in partition)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
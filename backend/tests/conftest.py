@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from authz import create_user_token
+from extensions import db
+from models import Category, Course, User
+
+@pytest.fixture
+def app_config():
+    # overridden by test modules that need other settings
+    return {}
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.sqlite"}',
+        'DATABASE_REPLICA_URL': None,
+        'JWT_SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+        'DB_MIGRATIONS': False,
+        'PASSWORD_HASH_WORKERS': 0,
+        'RATELIMIT_ENABLED': False,
+        'LOG_SAMPLE_RATE': 0,
+        **app_config
+    })
+
+    with app.app_context():
+        # modules that need the schema the migrations build (full-text
+        # search tables, triggers) turn DB_MIGRATIONS on
+        if app.config['DB_MIGRATIONS']:
+            result = app.test_cli_runner().invoke(args=['db', 'upgrade'])
+            assert result.exit_code == 0, result.output
+        else:
+            db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def add(app):
+    def add(*objects):
+        db.session.add_all(objects)
+        db.session.commit()
+        return objects[0] if len(objects) == 1 else objects
+    return add
+
+@pytest.fixture
+def admin(add):
+    return add(User(username='admin', email='admin@example.com', password='-', role='admin'))
+
+@pytest.fixture
+def student(add):
+    return add(User(username='student', email='student@example.com', password='-'))
+
+@pytest.fixture
+def category(add):
+    return add(Category(name='Python'))
+
+@pytest.fixture
+def course(add, admin, category):
+    return add(Course(title='Flask', teacher_id=admin.id, category_id=category.id))
+
+@pytest.fixture
+def auth():
+    def auth(user):
+        return {'Authorization': f'Bearer {create_user_token(user)}'}
+    return auth
+
+@pytest.fixture
+def count_statements(app):
+    # Counts what reaches the database cursor, so lazy loads and flushes
+    # are included, not just the statements a view executes itself.
+    @contextmanager
+    def count_statements():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return count_statements
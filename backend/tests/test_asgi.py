@@ -0,0 +1,89 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+from models import Course, Enrollment, Video
+
+pytest.importorskip('aiosqlite')
+from asgi import create_asgi_app
+
+async def call(asgi, method, path, query_string=None, headers=None):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi({
+        'type': 'http', 'method': method, 'path': path, 'query_string': urlencode(query_string or {}).encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    }, receive, send)
+
+    start, body = messages
+    return start['status'], {name.decode().lower(): value.decode() for name, value in start['headers']}, body['body']
+
+@pytest.fixture
+def asgi_request(app):
+    config = {'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'], 'JWT_SECRET_KEY': app.config['JWT_SECRET_KEY']}
+
+    def asgi_request(method, path, **kwargs):
+        async def run():
+            asgi = create_asgi_app(config)
+            try:
+                return await call(asgi, method, path, **kwargs)
+            finally:
+                await asgi.engine.dispose()
+        return asyncio.run(run())
+    return asgi_request
+
+@pytest.fixture
+def catalog(add, admin, student, category):
+    courses = add(*[Course(title=f'Course {i}', description='About it', teacher_id=admin.id, category_id=category.id) for i in range(3)])
+    add(*[Video(title=f'Video {i}', url=f'https://example.com/{i}', course_id=courses[0].id) for i in range(2)])
+    add(*[Enrollment(user_id=student.id, course_id=course.id) for course in courses[:2]])
+    student.enrollment_count = 2
+    add(student)
+    return [course.id for course in courses]
+
+@pytest.mark.parametrize('path, query_string', [
+    ('/courses', {}),
+    ('/courses', {'limit': 2}),
+    ('/courses', {'limit': 2, 'cursor': 2}),
+    ('/courses/1', {}),
+    ('/videos/1', {}),
+    ('/my-courses', {}),
+    ('/my-courses', {'limit': 1})
+])
+def test_same_responses_as_flask(client, auth, student, catalog, asgi_request, path, query_string):
+    headers = auth(student)
+
+    expected = client.get(path, headers=headers, query_string=query_string)
+    status, asgi_headers, body = asgi_request('GET', path, query_string=query_string, headers=headers)
+
+    assert status == expected.status_code == 200
+    assert asgi_headers['content-type'] == 'application/json'
+    assert json.loads(body) == expected.json
+    for name in ('X-Next-Cursor', 'X-Total-Count'):
+        assert asgi_headers.get(name.lower()) == expected.headers.get(name)
+
+@pytest.mark.parametrize('method, path, authorized, status', [
+    ('GET', '/courses/1', False, 401),
+    ('GET', '/my-courses', False, 401),
+    ('GET', '/courses/999', True, 404),
+    ('GET', '/videos/999', True, 404),
+    ('POST', '/courses/1', True, 405),
+    ('DELETE', '/my-courses', True, 405)
+])
+def test_same_errors_as_flask(client, auth, student, catalog, asgi_request, method, path, authorized, status):
+    headers = auth(student) if authorized else {}
+
+    expected = client.open(path, method=method, headers=headers)
+    asgi_status, _, body = asgi_request(method, path, headers=headers)
+
+    assert asgi_status == expected.status_code == status
+    if status != 405:
+        assert json.loads(body) == expected.json
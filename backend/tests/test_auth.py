@@ -0,0 +1,47 @@
+from werkzeug.security import generate_password_hash
+
+from extensions import db, password_hasher
+from models import User
+from services.passwords import HashQueueFull
+
+def login(client, email, password):
+    return client.post('/login', json={'email': email, 'password': password})
+
+def stored_password(user_id):
+    return db.session.execute(db.select(User.password).where(User.id == user_id)).scalar()
+
+def test_login_keeps_hash_of_shorthand_method(app, client, add):
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+    password_hasher.init_app(app)
+    user = add(User(username='student', email='student@example.com', password=password_hasher.hash('secret')))
+    user_id, password = user.id, user.password
+
+    for _ in range(2):
+        assert login(client, 'student@example.com', 'secret').status_code == 200
+        assert stored_password(user_id) == password
+
+def test_login_rehashes_other_methods(client, add):
+    user = add(User(username='student', email='student@example.com', password=generate_password_hash('secret', 'pbkdf2:sha256:1000')))
+    user_id = user.id
+
+    assert login(client, 'student@example.com', 'secret').status_code == 200
+    assert stored_password(user_id).startswith(password_hasher.method + '$')
+
+def test_login_with_wrong_password(client, add):
+    add(User(username='student', email='student@example.com', password=generate_password_hash('secret', 'pbkdf2:sha256:1000')))
+
+    assert login(client, 'student@example.com', 'wrong').status_code == 401
+
+def test_login_skips_rehash_when_hash_queue_is_full(client, add, monkeypatch):
+    user = add(User(username='student', email='student@example.com', password=generate_password_hash('secret', 'pbkdf2:sha256:1000')))
+    user_id, password = user.id, user.password
+
+    def hash(password):
+        raise HashQueueFull()
+    monkeypatch.setattr(password_hasher, 'hash', hash)
+
+    response = login(client, 'student@example.com', 'secret')
+
+    assert response.status_code == 200
+    assert 'access_token' in response.json
+    assert stored_password(user_id) == password
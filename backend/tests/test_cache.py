@@ -0,0 +1,86 @@
+import pytest
+from flask import jsonify
+
+from cache import CacheBackend, ResponseCache
+
+class DictBackend(CacheBackend):
+    # stands in for a shared backend, ttls are ignored
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+@pytest.fixture
+def cache(app):
+    app.config['CACHE_BACKEND'] = DictBackend()
+    cache = ResponseCache()
+    cache.init_app(app)
+    return cache
+
+def builder(body, tags, during=None):
+    def build():
+        build.calls += 1
+        if during:
+            during()
+        response = jsonify(body)
+        response.headers['X-Total-Count'] = str(len(body))
+        return response, 200, tags
+    build.calls = 0
+    return build
+
+def respond(app, cache, key, build, headers=None):
+    with app.test_request_context('/', headers=headers):
+        return cache.respond(key, build)
+
+def test_cached_response_is_conditional(app, cache):
+    build = builder([1, 2], ['course:1'])
+
+    first = respond(app, cache, 'courses', build)
+    second = respond(app, cache, 'courses', build, {'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200 and first.json == [1, 2]
+    assert first.headers['X-Total-Count'] == '2'
+    assert second.status_code == 304
+    assert build.calls == 1
+
+def test_invalidate_drops_only_tagged_entries(app, cache):
+    first = builder([1], ['course:1', 'courses'])
+    second = builder([2], ['course:2', 'courses'])
+    respond(app, cache, 'first', first)
+    respond(app, cache, 'second', second)
+
+    cache.invalidate('course:1')
+    respond(app, cache, 'first', first)
+    respond(app, cache, 'second', second)
+    assert (first.calls, second.calls) == (2, 1)
+
+    cache.invalidate('courses')
+    respond(app, cache, 'first', first)
+    respond(app, cache, 'second', second)
+    assert (first.calls, second.calls) == (3, 2)
+
+def test_write_during_build_is_not_cached(app, cache):
+    stale = builder(['stale'], ['course:1'], during=lambda: cache.invalidate('course:1'))
+    fresh = builder(['fresh'], ['course:1'])
+
+    assert respond(app, cache, 'course', stale).json == ['stale']
+    assert 'response:course' not in cache.backend.data
+    assert respond(app, cache, 'course', fresh).json == ['fresh']
+    assert respond(app, cache, 'course', fresh).json == ['fresh']
+    assert fresh.calls == 1
+
+def test_error_responses_are_not_cached(app, cache):
+    def build():
+        return jsonify({'message': 'Course not found'}), 404, []
+
+    response, status = respond(app, cache, 'course', build)
+
+    assert status == 404
+    assert 'response:course' not in cache.backend.data
@@ -0,0 +1,58 @@
+import pytest
+
+from models import Course
+from services import catalog
+
+def test_catalog_keeps_changes_committed_during_first_build(client, add, monkeypatch, admin, category):
+    teacher_id, category_id = admin.id, category.id
+    original = catalog.build
+
+    def build(connection, version):
+        snapshot = original(connection, version)
+        # committed after the build read the tables, before it is published
+        add(Course(title='Late', teacher_id=teacher_id, category_id=category_id))
+        monkeypatch.setattr(catalog, 'build', original)
+        return snapshot
+    monkeypatch.setattr(catalog, 'build', build)
+
+    first = client.get('/courses')
+    second = client.get('/courses')
+
+    assert first.status_code == 200 and first.json == []
+    assert second.status_code == 200 and [course['title'] for course in second.json] == ['Late']
+
+def test_catalog_lists_new_courses(client, auth, admin, category):
+    headers = auth(admin)
+    assert client.get('/courses').json == []
+
+    response = client.post('/courses/add', headers=headers, json={'title': 'Flask', 'teacher_id': admin.id, 'category_id': category.id})
+
+    assert response.status_code == 201
+    assert [course['title'] for course in client.get('/courses').json] == ['Flask']
+    assert client.get('/categories').json == [{'id': category.id, 'name': 'Python'}]
+
+def test_catalog_accepts_ids_sent_as_strings(client, auth, admin, course):
+    headers, course_id = auth(admin), course.id
+    assert [entry['video_count'] for entry in client.get('/courses').json] == [0]
+
+    response = client.post('/videos/add', headers=headers, json={'title': 'Intro', 'url': 'https://youtu.be/dQw4w9WgXcQ', 'course_id': str(course_id)})
+    assert response.status_code == 201
+
+    response = client.get('/courses')
+    assert response.status_code == 200
+    assert [(entry['id'], entry['video_count']) for entry in response.json] == [(course_id, 1)]
+
+def test_catalog_rebuilds_after_a_failed_update(client, add, monkeypatch, course):
+    category_id, teacher_id = course.category_id, course.teacher_id
+    assert len(client.get('/courses').json) == 1
+
+    def update(snapshot, connection, course_ids, category_ids, version):
+        raise TypeError('broken update')
+    monkeypatch.setattr(catalog, 'update', update)
+    add(Course(title='Late', teacher_id=teacher_id, category_id=category_id))
+
+    with pytest.raises(TypeError):
+        client.get('/courses')
+    monkeypatch.undo()
+
+    assert [entry['title'] for entry in client.get('/courses').json] == ['Flask', 'Late']
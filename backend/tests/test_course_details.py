@@ -0,0 +1,17 @@
+from models import Video
+
+def test_course_details_runs_two_statements(client, add, auth, count_statements, student, course):
+    add(*[Video(title=f'Video {i}', url=f'https://www.youtube.com/embed/video{i}', course_id=course.id) for i in range(10)])
+    url, headers = f'/courses/{course.id}', auth(student)
+
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.json['videos']) == 10
+    assert len(statements) <= 2
+
+def test_course_details_not_found(client, auth, student):
+    response = client.get('/courses/1', headers=auth(student))
+
+    assert response.status_code == 404
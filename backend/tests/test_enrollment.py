@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from extensions import db
+from models import Course, Enrollment, User
+
+REQUESTS = 1000
+THREADS = 8
+
+def test_concurrent_enrollments_create_one_row(app, auth, student, course):
+    url, headers = f'/courses/{course.id}/enroll', auth(student)
+    course_id, user_id = course.id, student.id
+
+    def enroll(_):
+        started = time.perf_counter()
+        response = app.test_client().post(url, headers=headers)
+        return response.status_code, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(enroll, range(REQUESTS)))
+
+    statuses = [status for status, _ in results]
+    assert statuses.count(201) == 1
+    assert statuses.count(400) == REQUESTS - 1
+
+    # SQLite serializes the writes, so the tail is mostly lock waits; no
+    # request may come close to its 5s busy timeout
+    latencies = sorted(latency for _, latency in results)
+    assert latencies[REQUESTS // 2] < 0.25
+    assert latencies[-1] < 2
+
+    db.session.expire_all()
+    assert db.session.execute(db.select(db.func.count(Enrollment.id)).where(
+        Enrollment.user_id == user_id, Enrollment.course_id == course_id
+    )).scalar() == 1
+    assert db.session.get(Course, course_id).enrollment_count == 1
+    assert db.session.get(User, user_id).enrollment_count == 1
+
+def test_enroll_unknown_course(client, auth, student):
+    response = client.post('/courses/1/enroll', headers=auth(student))
+
+    assert response.status_code == 404
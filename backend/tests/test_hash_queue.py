@@ -0,0 +1,33 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import User
+
+@pytest.fixture
+def app_config():
+    # a real pool, but no room in its queue
+    return {'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_QUEUE': 0}
+
+@pytest.fixture
+def user(add):
+    return add(User(username='student', email='student@example.com', password=generate_password_hash('secret', 'pbkdf2:sha256:1000')))
+
+def test_login_with_full_queue(client, user):
+    response = client.post('/login', json={'email': 'student@example.com', 'password': 'secret'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+def test_signup_with_full_queue(client):
+    response = client.post('/signup', json={'username': 'new', 'email': 'new@example.com', 'password': 'secret'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+def test_login_through_the_pool(app, client, user):
+    app.config['PASSWORD_HASH_QUEUE'] = 4
+    app.extensions['password_hasher'].init_app(app)
+
+    response = client.post('/login', json={'email': 'student@example.com', 'password': 'secret'})
+
+    assert response.status_code == 200
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+from extensions import db
+from models import Course
+from services import idempotency
+
+RETRIES = 32
+
+def test_parallel_retries_create_one_course(app, auth, admin, category):
+    headers = {**auth(admin), 'Idempotency-Key': 'create-flask-course'}
+    data = {'title': 'Flask', 'teacher_id': admin.id, 'category_id': category.id}
+
+    def send(_):
+        response = app.test_client().post('/courses/add', headers=headers, json=data)
+        return response.status_code, response.headers.get('Idempotent-Replayed')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(send, range(RETRIES)))
+
+    assert all(status in (201, 409) for status, _ in results), results
+    assert results.count((201, None)) == 1
+    assert db.session.execute(db.select(db.func.count(Course.id))).scalar() == 1
+
+    # a later retry is answered from memory, and from the database once forgotten
+    for _ in range(2):
+        assert send(None) == (201, 'true')
+        idempotency.store.responses = LRUCache(maxsize=16)
+    assert db.session.execute(db.select(db.func.count(Course.id))).scalar() == 1
+
+def test_reused_key_with_other_request(client, auth, admin, category):
+    headers = {**auth(admin), 'Idempotency-Key': 'create-course'}
+    data = {'title': 'Flask', 'teacher_id': admin.id, 'category_id': category.id}
+
+    assert client.post('/courses/add', headers=headers, json=data).status_code == 201
+    assert client.post('/courses/add', headers=headers, json={**data, 'title': 'Django'}).status_code == 422
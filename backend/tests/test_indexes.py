@@ -0,0 +1,31 @@
+import pytest
+
+import serializers
+from extensions import db
+from models import Enrollment
+
+QUERIES = {
+    'enrollment_user_course': (
+        db.select(Enrollment.id).where(Enrollment.user_id == 1, Enrollment.course_id == 1), 'enrollment', None
+    ),
+    'course_category': (serializers.course_page(category_id=1), 'course', 'ix_course_category_id'),
+    'course_category_cursor': (serializers.course_page(cursor=10, category_id=1), 'course', 'ix_course_category_id'),
+    'video_course': (serializers.course_videos(1), 'video', 'ix_video_course_id'),
+    'user_role': (serializers.teachers(), 'user', 'ix_user_role_id_username')
+}
+
+def query_plan(query):
+    sql = str(query.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    return [row[3] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_query_uses_index(app, name):
+    query, table, index = QUERIES[name]
+    plan = query_plan(query)
+
+    steps = [step for step in plan if step.split()[1] == table]
+    assert steps, plan
+    for step in steps:
+        assert step.startswith('SEARCH') and ' INDEX ' in step, plan
+        if index:
+            assert index in step, plan
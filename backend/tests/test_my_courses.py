@@ -0,0 +1,20 @@
+from models import Course, Enrollment, User
+
+def test_my_courses_statements_do_not_grow_with_enrollments(client, add, auth, count_statements, admin, category):
+    courses = add(*[Course(title=f'Course {i}', teacher_id=admin.id, category_id=category.id) for i in range(50)])
+    counts = {}
+
+    for n in (1, 50):
+        user = add(User(username=f'student{n}', email=f'student{n}@example.com', password='-', enrollment_count=n))
+        add(*[Enrollment(user_id=user.id, course_id=course.id) for course in courses[:n]])
+        headers = auth(user)
+
+        with count_statements() as statements:
+            response = client.get('/my-courses', headers=headers)
+
+        assert response.status_code == 200
+        assert len(response.json) == n
+        assert response.headers['X-Total-Count'] == str(n)
+        counts[n] = len(statements)
+
+    assert counts[1] == counts[50]
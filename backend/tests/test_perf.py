@@ -0,0 +1,59 @@
+import pytest
+
+from app import create_app
+from extensions import db, metrics
+from perf import SCENARIOS, prepare
+from services import progress
+
+# The scenarios of 'flask perf run' under pytest-benchmark, on a small
+# seeded SQLite file. A scenario registered in perf.py is picked up here
+# too; compare runs with --benchmark-autosave and --benchmark-compare.
+
+ROUNDS = 20
+SEED = ['--users', '200', '--teachers', '10', '--categories', '5', '--courses', '100', '--videos', '500', '--enrollments', '1000']
+
+@pytest.fixture(scope='module')
+def perf(tmp_path_factory):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path_factory.mktemp("perf") / "perf.sqlite"}',
+        'DATABASE_REPLICA_URL': None,
+        'JWT_SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+        'PASSWORD_HASH_WORKERS': 0,
+        'RATELIMIT_ENABLED': False,
+        'METRICS_ENABLED': True,
+        'LOG_SAMPLE_RATE': 0
+    })
+
+    # migrations, not create_all: search needs the full-text tables
+    with app.app_context():
+        for args in (['db', 'upgrade'], ['perf', 'seed', *SEED]):
+            result = app.test_cli_runner().invoke(args=args)
+            assert result.exit_code == 0, result.output
+        ctx = prepare(ROUNDS, seed=1)
+        db.session.remove()
+
+    yield app, ctx
+
+    progress.buffer.flush()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+@pytest.mark.parametrize('name', SCENARIOS)
+def test_scenario(benchmark, perf, name):
+    app, ctx = perf
+    item = SCENARIOS[name]
+    client = app.test_client()
+    # built up front, so only the requests themselves are timed
+    requests = iter([item.build(ctx, i) for i in range(ROUNDS)])
+    statuses = []
+
+    def send():
+        path, kwargs = next(requests)
+        statuses.append(client.open(path, method=item.method, **kwargs).status_code)
+
+    statements = metrics.statements[name]
+    benchmark.pedantic(send, rounds=ROUNDS, iterations=1)
+    benchmark.extra_info['db_statements_per_request'] = (metrics.statements[name] - statements) / ROUNDS
+
+    assert all(status in item.status for status in statuses), statuses
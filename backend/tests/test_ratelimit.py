@@ -0,0 +1,54 @@
+import itertools
+import time
+
+import pytest
+
+import ratelimit
+from ratelimit import Limit, MemoryBucketStore
+
+@pytest.fixture
+def app_config():
+    return {'RATELIMIT_ENABLED': True, 'RATELIMIT_LIMITS': {'auth': '10/minute', 'course': '1000000/second'}}
+
+def test_auth_burst_is_limited(client):
+    for _ in range(10):
+        response = client.post('/login', json={'email': 'nobody@example.com', 'password': 'wrong'})
+        assert response.status_code != 429
+
+    response = client.post('/login', json={'email': 'nobody@example.com', 'password': 'wrong'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '6'
+    assert response.headers['RateLimit-Limit'] == '10'
+    assert response.headers['RateLimit-Remaining'] == '0'
+    assert 0 < int(response.headers['RateLimit-Reset']) <= 60
+
+def test_reads_are_not_limited(client):
+    for _ in range(12):
+        response = client.get('/courses')
+        assert response.status_code == 200
+        assert 'RateLimit-Limit' not in response.headers
+
+def test_benchmark_check_cached_identity(app, benchmark, monkeypatch, admin, auth):
+    limiter = app.extensions['rate_limiter']
+
+    with app.test_request_context('/courses/add', method='POST', headers=auth(admin)):
+        assert limiter.check() is None
+
+        # the token is only decoded once, every later check hits the cache
+        def decode_token(token):
+            raise AssertionError('token decoded again')
+        monkeypatch.setattr(ratelimit, 'decode_token', decode_token)
+
+        assert benchmark(limiter.check) is None
+
+def test_benchmark_bucket_take(benchmark):
+    store = MemoryBucketStore()
+    limit = Limit(1000000, 1)
+    keys = itertools.cycle([f'course:user:{user_id}' for user_id in range(1000)])
+
+    def take():
+        return store.take(next(keys), limit, time.time())
+
+    allowed, _ = benchmark(take)
+    assert allowed
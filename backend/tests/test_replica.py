@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from sqlalchemy.orm import Session
+
+from database import REPLICA_BIND
+from extensions import db
+from models import Category, Course, User, Video
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'DATABASE_REPLICA_URL': f'sqlite:///{tmp_path / "replica.sqlite"}'}
+
+@pytest.fixture
+def replica(app):
+    engine = db.engines[REPLICA_BIND]
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def same_rows(session, title):
+    session.add_all([
+        User(id=1, username='admin', email='admin@example.com', password='-', role='admin'),
+        User(id=2, username='student', email='student@example.com', password='-'),
+        Category(id=1, name='Python'),
+        Course(id=1, title=title, teacher_id=1, category_id=1)
+    ])
+    session.commit()
+
+@pytest.fixture
+def rows(app, replica):
+    same_rows(db.session, 'On the primary')
+    same_rows(replica, 'On the replica')
+    replica.add(Video(id=1, title='Only on the replica', url='https://example.com/1', course_id=1))
+    replica.commit()
+    return db.session.get(User, 1), db.session.get(User, 2)
+
+def test_reads_come_from_the_replica(client, auth, rows):
+    _, student = rows
+    headers = auth(student)
+
+    course = client.get('/courses/1', headers=headers)
+    video = client.get('/videos/1', headers=headers)
+
+    assert course.status_code == 200 and course.json['title'] == 'On the replica'
+    assert [video['title'] for video in course.json['videos']] == ['Only on the replica']
+    assert video.status_code == 200 and video.json['title'] == 'Only on the replica'
+
+def test_writes_land_on_the_primary(client, auth, rows, replica):
+    admin, student = rows
+
+    response = client.put('/courses/1/update', headers=auth(admin), json={'title': 'Renamed'})
+    enrolled = client.post('/courses/1/enroll', headers=auth(student))
+
+    assert response.status_code == 200 and enrolled.status_code == 201
+    assert db.session.execute(db.select(Course.title).where(Course.id == 1)).scalar() == 'Renamed'
+    assert replica.execute(db.select(Course.title).where(Course.id == 1)).scalar() == 'On the replica'
+    assert db.session.execute(db.select(Course.enrollment_count).where(Course.id == 1)).scalar() == 1
+
+def test_catalog_snapshot_reads_the_primary(client, rows):
+    listed = client.get('/courses').json
+    streamed = [json.loads(line) for line in client.get('/courses', query_string={'stream': 1}).get_data(as_text=True).splitlines()]
+
+    assert [course['title'] for course in listed] == ['On the primary']
+    assert [course['title'] for course in streamed] == ['On the replica']
@@ -0,0 +1,60 @@
+import pytest
+
+from models import Course, Video
+
+@pytest.fixture
+def app_config():
+    return {'DB_MIGRATIONS': True}
+
+@pytest.fixture
+def courses(add, admin, category):
+    return add(
+        Course(title='Cooking for beginners', description='Recipes written by a python programmer', teacher_id=admin.id, category_id=category.id),
+        Course(title='Python basics', description='Variables, loops and functions', teacher_id=admin.id, category_id=category.id)
+    )
+
+def search(client, q, **params):
+    return client.get('/search', query_string={'q': q, **params})
+
+def hits(response):
+    assert response.status_code == 200
+    return [(hit['type'], hit['title']) for hit in response.json]
+
+def test_title_hit_ranks_above_body_hit(client, courses):
+    assert hits(search(client, 'python')) == [('course', 'Python basics'), ('course', 'Cooking for beginners')]
+
+def test_last_term_is_a_prefix(client, courses):
+    assert hits(search(client, 'pyth')) == [('course', 'Python basics'), ('course', 'Cooking for beginners')]
+    assert hits(search(client, 'python basi')) == [('course', 'Python basics')]
+    assert hits(search(client, 'basi python')) == []
+
+def test_cursor_is_the_next_offset(client, add, courses):
+    add(*[Video(title=f'Flask part {i}', url=f'https://example.com/{i}', course_id=courses[1].id) for i in range(5)])
+
+    first = search(client, 'flask', limit=2)
+    second = search(client, 'flask', limit=2, cursor=first.headers['X-Next-Cursor'])
+    last = search(client, 'flask', limit=2, cursor=second.headers['X-Next-Cursor'])
+
+    assert (first.headers['X-Next-Cursor'], second.headers['X-Next-Cursor']) == ('2', '4')
+    assert 'X-Next-Cursor' not in last.headers
+    titles = [title for response in (first, second, last) for _, title in hits(response)]
+    assert sorted(titles) == [f'Flask part {i}' for i in range(5)]
+
+def test_index_follows_updates_and_deletes(client, auth, add, admin, courses):
+    video = add(Video(title='Decorators explained', url='https://example.com/decorators', course_id=courses[1].id))
+    headers, course_id, video_id = auth(admin), courses[1].id, video.id
+
+    assert client.put(f'/courses/{course_id}/update', headers=headers, json={'title': 'Advanced Django'}).status_code == 200
+    assert hits(search(client, 'django')) == [('course', 'Advanced Django')]
+    assert hits(search(client, 'basics')) == []
+
+    assert hits(search(client, 'decorators')) == [('video', 'Decorators explained')]
+    assert client.delete(f'/videos/{video_id}/delete', headers=headers).status_code == 200
+    assert hits(search(client, 'decorators')) == []
+
+@pytest.mark.parametrize('q', ['', '   ', '!!! ???'])
+def test_empty_query_is_rejected(client, q):
+    response = search(client, q)
+
+    assert response.status_code == 400
+    assert response.json == {'message': 'Invalid query'}
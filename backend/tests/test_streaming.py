@@ -0,0 +1,71 @@
+import json
+import tracemalloc
+
+import pytest
+
+from extensions import db
+from models import Course, Enrollment
+from streaming import NDJSON
+
+ENDPOINTS = ['/courses', '/categories', '/my-courses', '/users/teachers']
+STREAM_ROWS = 2000
+
+@pytest.fixture
+def catalog(add, admin, student, category):
+    courses = add(*[Course(title=f'Course {i}', teacher_id=admin.id, category_id=category.id) for i in range(3)])
+    add(Enrollment(user_id=student.id, course_id=courses[0].id))
+    return courses
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == NDJSON
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_stream_matches_json(client, auth, student, catalog, path):
+    headers = auth(student)
+    expected = client.get(path, headers=headers).json
+
+    by_param = ndjson(client.get(path, headers=headers, query_string={'stream': 1}))
+    by_accept = ndjson(client.get(path, headers={**headers, 'Accept': NDJSON}))
+
+    assert by_param == by_accept
+    assert [row['id'] for row in by_param] == [row['id'] for row in expected]
+
+def test_json_is_preferred_when_both_are_accepted(client, catalog):
+    response = client.get('/courses', headers={'Accept': f'application/json, {NDJSON}'})
+
+    assert response.mimetype == 'application/json'
+
+def streamed_peak(client, count):
+    # consumes the stream line by line and keeps nothing, so the peak is
+    # what the server side holds while producing it
+    tracemalloc.start()
+    try:
+        response = client.get('/courses', query_string={'stream': 1}, buffered=False)
+        lines = sum(chunk.count(b'\n') for chunk in response.response)
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == count
+    return peak
+
+def insert_courses(count, teacher_id, category_id):
+    db.session.execute(db.insert(Course), [
+        {'title': f'Course {i}', 'description': 'x' * 200, 'teacher_id': teacher_id, 'category_id': category_id} for i in range(count)
+    ])
+    db.session.commit()
+
+def test_stream_memory_does_not_grow_with_rows(client, admin, category):
+    teacher_id, category_id = admin.id, category.id
+    insert_courses(STREAM_ROWS, teacher_id, category_id)
+    # the first request compiles and caches statements, keep that out of the peaks
+    streamed_peak(client, STREAM_ROWS)
+    small = streamed_peak(client, STREAM_ROWS)
+
+    insert_courses(9 * STREAM_ROWS, teacher_id, category_id)
+    large = streamed_peak(client, 10 * STREAM_ROWS)
+
+    assert large < small * 1.5, (small, large)
@@ -0,0 +1,85 @@
+import os
+import random
+import re
+
+import pytest
+
+from video_urls import format_url, normalize_many
+
+VIDEO_ID = 'dQw4w9WgXcQ'
+EMBED = f'https://www.youtube.com/embed/{VIDEO_ID}?modestbranding=1&rel=0'
+
+# run with BENCHMARK_URLS=1000000 for the full-size comparison
+BENCHMARK_URLS = int(os.environ.get('BENCHMARK_URLS', 20000))
+
+@pytest.mark.parametrize('url', [
+    f'https://youtu.be/{VIDEO_ID}',
+    f'https://youtu.be/{VIDEO_ID}?t=42',
+    f'youtu.be/{VIDEO_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/watch?feature=share&list=PL1&v={VIDEO_ID}',
+    f'https://m.youtube.com/watch?v={VIDEO_ID}&t=10s',
+    f'HTTPS://WWW.YOUTUBE.COM/watch?v={VIDEO_ID}',
+    f'https://www.youtube.com/embed/{VIDEO_ID}',
+    f'https://www.youtube-nocookie.com/embed/{VIDEO_ID}',
+    f'https://youtube.com/shorts/{VIDEO_ID}',
+    f'https://www.youtube.com/live/{VIDEO_ID}?si=abc',
+    f'  https://youtu.be/{VIDEO_ID}  ',
+    EMBED
+])
+def test_youtube_urls_become_embeds(url):
+    assert format_url(url) == EMBED
+
+@pytest.mark.parametrize('url', [
+    'https://example.com/abcdefghijk',
+    'https://example.com/videos/abcdefghijk.mp4',
+    f'https://notyoutube.com/watch?v={VIDEO_ID}',
+    f'https://youtube.com.example.com/watch?v={VIDEO_ID}',
+    f'https://example.com/?next=https://youtu.be/{VIDEO_ID}',
+    f'https://www.youtube.com/watch?v={VIDEO_ID}x',
+    'https://www.youtube.com/watch?v=short',
+    'https://vimeo.com/123456789'
+])
+def test_other_urls_are_kept(url):
+    assert format_url(url) == url.strip()
+
+def test_normalize_many_keeps_order():
+    urls = [f'https://youtu.be/{VIDEO_ID}', 'https://example.com/abcdefghijk', f'https://youtube.com/shorts/{VIDEO_ID}']
+
+    assert normalize_many(urls) == [EMBED, 'https://example.com/abcdefghijk', EMBED]
+
+def re_search_format_url(url):
+    # the version video_urls replaced, kept as the baseline
+    match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11}).*", url)
+    if match:
+        return f"https://www.youtube.com/embed/{match.group(1)}?modestbranding=1&rel=0"
+    return url
+
+def benchmark_urls(count):
+    # an import mixes YouTube links with other hosts and repeats some urls
+    rng = random.Random(1)
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+    templates = [
+        'https://www.youtube.com/watch?v={}', 'https://youtu.be/{}', 'https://www.youtube.com/embed/{}?modestbranding=1&rel=0',
+        'https://youtube.com/shorts/{}', 'https://cdn.example.com/videos/{}.mp4', 'https://vimeo.com/{}'
+    ]
+    ids = [''.join(rng.choice(alphabet) for _ in range(11)) for _ in range(count // 2 or 1)]
+    return [rng.choice(templates).format(rng.choice(ids)) for _ in range(count)]
+
+@pytest.mark.parametrize('name', ['re.search', 'format_url', 'normalize_many'])
+def test_benchmark_normalize(benchmark, name):
+    urls = benchmark_urls(BENCHMARK_URLS)
+    normalize = {
+        're.search': lambda urls: [re_search_format_url(url) for url in urls],
+        'format_url': lambda urls: [format_url(url) for url in urls],
+        'normalize_many': normalize_many
+    }[name]
+
+    def setup():
+        # every round starts cold, as a fresh worker would
+        format_url.cache_clear()
+        return (urls,), {}
+
+    benchmark.group = f'normalize {len(urls)} urls'
+    result = benchmark.pedantic(normalize, setup=setup, rounds=5)
+    assert len(result) == len(urls)
@@ -0,0 +1,20 @@
+from extensions import db
+from models import Video
+
+def test_bulk_import_reports_invalid_rows(client, auth, admin, course):
+    headers = auth(admin)
+    entries = [
+        {'title': 'Intro', 'url': 123, 'course_id': course.id},
+        {'title': 'Intro', 'url': ['https://youtu.be/abc'], 'course_id': course.id},
+        {'title': None, 'url': 'https://youtu.be/abc', 'course_id': course.id},
+        {'title': 'Intro', 'url': 'https://youtu.be/abc', 'course_id': course.id}
+    ]
+
+    response = client.post('/videos/bulk', json=entries, headers=headers)
+
+    assert response.status_code == 201
+    assert response.json == {
+        'created': 1,
+        'errors': [{'index': index, 'message': 'Invalid title or url'} for index in range(3)]
+    }
+    assert db.session.execute(db.select(db.func.count(Video.id))).scalar() == 1
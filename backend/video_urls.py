@@ -0,0 +1,28 @@
+import re
+from functools import lru_cache
+
+EMBED_URL = 'https://www.youtube.com/embed/{}?modestbranding=1&rel=0'
+
+YOUTUBE_URL = re.compile(
+    r'(?i:https?://)?(?i:(?:www|m|music)\.)?'
+    r'(?:(?i:youtu\.be)/'
+    r'|(?i:youtube(?:-nocookie)?\.com)/(?:embed/|shorts/|live/|v/|watch/?\?(?:[^#]*&)?v=))'
+    r'([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])'
+)
+
+@lru_cache(maxsize=65536)
+def format_url(url):
+    url = url.strip()
+
+    # Most non-YouTube urls never reach the regex.
+    if 'youtu' not in url.lower():
+        return url
+
+    match = YOUTUBE_URL.match(url)
+    if match:
+        return EMBED_URL.format(match.group(1))
+
+    return url
+
+def normalize_many(urls):
+    return [format_url(url) for url in urls]
@@ -1,5 +1,5 @@
 import { useParams, useNavigate } from "react-router-dom";
-import { useState } from "react";
+import { useRef, useState } from "react";
 import styles from "./AddVideo.module.css";
 import { ssrImportKey } from "vite/module-runner";
 
@@ -9,6 +9,7 @@ function AddVideo() {
     const [ url, setUrl ] = useState('');
     const [ error, setError ] = useState(null);
     const { id } = useParams();
+    const idempotencyKey = useRef(crypto.randomUUID());
 
     const navigate = useNavigate()
 
@@ -21,7 +22,8 @@ function AddVideo() {
             method: "POST",
             headers: {
                 "Authorization": `Bearer ${token}`,
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Idempotency-Key": idempotencyKey.current
             },
             body: JSON.stringify({
                 title: title,
@@ -31,6 +33,11 @@ function AddVideo() {
             })
         });
 
+        if (response.status === 409) {
+            return
+        }
+        idempotencyKey.current = crypto.randomUUID();
+
         if (response.status === 401) {
             localStorage.removeItem("token");
             console.log("Token expired");
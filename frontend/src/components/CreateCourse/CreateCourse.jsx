@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import styles from "./CreateCourse.module.css";
 
@@ -9,6 +9,8 @@ function CreateCourse() {
     const [category_id, setCategory_ID] = useState('');
     const [teachers, setTeachers] = useState([]);
     const [categories, setCategories] = useState([]);
+    // repeated submits of the same course reuse the key, so it's only created once
+    const idempotencyKey = useRef(crypto.randomUUID());
 
     useEffect(() => {
         
@@ -62,7 +64,8 @@ function CreateCourse() {
             method: "POST",
             headers: {
                 "Authorization": `Bearer ${token}`,
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Idempotency-Key": idempotencyKey.current
             },
             body: JSON.stringify({
                 title: title,
@@ -72,6 +75,11 @@ function CreateCourse() {
             })
         });
 
+        if (response.status == 409) {
+            return;
+        }
+        idempotencyKey.current = crypto.randomUUID();
+
         if (response.status == 401) {
             localStorage.removeItem("token");
             console.log("Token has expired");
@@ -4,13 +4,19 @@ import styles from "./Dashboard.module.css";
 
 function Dashboard() {
     const [ myCourses, setMyCourses ] = useState([]);
+    const [ total, setTotal ] = useState(0);
+    const [ nextCursor, setNextCursor ] = useState(null);
+    const [ loading, setLoading ] = useState(false);
 
     const navigate = useNavigate();
 
-    async function getMyCourses() {
+    // /my-courses is paginated: X-Next-Cursor points to the next page and
+    // X-Total-Count holds the number of enrollments
+    async function getMyCourses(cursor) {
         const token = localStorage.getItem("token");
 
-        const response = await fetch("http://127.0.0.1:5000/my-courses", {
+        setLoading(true);
+        const response = await fetch(`http://127.0.0.1:5000/my-courses${cursor ? `?cursor=${cursor}` : ""}`, {
             method: "GET",
             headers: {
                 "Authorization": `Bearer ${token}`
@@ -24,8 +30,10 @@ function Dashboard() {
         }
 
         const data = await response.json();
-        setMyCourses(data)
-        console.log(data) //DEBUG
+        setMyCourses((previous) => cursor ? [...previous, ...data] : data)
+        setTotal(Number(response.headers.get("X-Total-Count") ?? data.length))
+        setNextCursor(response.headers.get("X-Next-Cursor"))
+        setLoading(false);
     }
 
     useEffect(() => {
@@ -35,6 +43,9 @@ function Dashboard() {
     return (
         <div className={styles.container}>
             <h2 className={styles.title}>Meu Dashboard:</h2>
+            {total > 0 && (
+                <p className={styles.total}>{total} {total === 1 ? "curso matriculado" : "cursos matriculados"}</p>
+            )}
             {myCourses.length === 0 ? (
                 <p className={styles.emptyMessage}>Você não se matriculou em nenhum curso ainda</p>
             ) : (
@@ -51,6 +62,11 @@ function Dashboard() {
                     ))}
                 </div>
             )}
+            {nextCursor && (
+                <button className={styles.loadMoreBtn} onClick={() => getMyCourses(nextCursor)} disabled={loading}>
+                    {loading ? "Carregando..." : "Carregar mais"}
+                </button>
+            )}
         </div>
     )
 }
@@ -4,26 +4,32 @@ import styles from "./Home.module.css";
 
 function Home(){
     const [courses, setCourses] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loading, setLoading] = useState(false);
 
     const navigate = useNavigate();
 
     const role = localStorage.getItem("role")
 
-    useEffect(() => {
-        async function getCourses() {
-            const token = localStorage.getItem("token");
+    // /courses is paginated: each page says where the next one starts in X-Next-Cursor
+    async function getCourses(cursor) {
+        const token = localStorage.getItem("token");
+
+        setLoading(true);
+        const response = await fetch(`http://127.0.0.1:5000/courses${cursor ? `?cursor=${cursor}` : ""}`, {
+            method: "GET",
+            headers: {
+                "Authorization": `Bearer ${token}`
+            }
+        });
 
-            const response = await fetch("http://127.0.0.1:5000/courses", {
-                method: "GET",
-                headers: {
-                    "Authorization": `Bearer ${token}`
-                }
-            });
+        const data = await response.json();
+        setCourses((previous) => cursor ? [...previous, ...data] : data);
+        setNextCursor(response.headers.get("X-Next-Cursor"));
+        setLoading(false);
+    }
 
-            const data = await response.json();
-            setCourses(data);
-            console.log(data); //DEBUG
-        }
+    useEffect(() => {
         getCourses();
     }, []);
 
@@ -62,6 +68,11 @@ function Home(){
 
                 </div>
             )}
+            {nextCursor && (
+                <button className={styles.loadMoreBtn} onClick={() => getCourses(nextCursor)} disabled={loading}>
+                    {loading ? "Carregando..." : "Carregar mais"}
+                </button>
+            )}
         </div>
     )
 }
@@ -39,6 +39,8 @@ function Plans() {
         }
 
         if (response.ok) {
+            const data = await response.json();
+            localStorage.setItem("token", data.access_token);
             localStorage.setItem("plan_type", plan_value);
             navigate("/home");
             return
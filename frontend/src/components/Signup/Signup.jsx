@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useRef, useState } from "react";
 import { useNavigate, Link } from "react-router-dom";
 import styles from "./Signup.module.css"
 
@@ -8,6 +8,7 @@ function Signup() {
     const [ password, setPassword ] = useState('')
     const [ confirmPassword, setConfirmPassword ] = useState('')
     const [ error, setError ] = useState(null)
+    const idempotencyKey = useRef(crypto.randomUUID())
 
     const navigate = useNavigate()
 
@@ -21,11 +22,17 @@ function Signup() {
         const response = await fetch('http://127.0.0.1:5000/signup', {
             method: "POST",
             headers: {
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Idempotency-Key": idempotencyKey.current
             },
             body: JSON.stringify({username: username, email: email, password: password})
         });
 
+        if (response.status === 409) {
+            return
+        }
+        idempotencyKey.current = crypto.randomUUID()
+
         const data = await response.json()
         console.log(data)
 
@@ -1,10 +1,12 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useParams } from "react-router-dom";
 import styles from "./VideoPlayer.module.css"
 
 function VideoPlayer() {
     const { video_id } = useParams();
     const [video, setVideo] = useState(null)
+    const iframeRef = useRef(null);
+    const progress = useRef({ position: 0, duration: null, sent: 0 });
     console.log(video_id) //DEBUG
 
     useEffect(() => {
@@ -24,6 +26,56 @@ function VideoPlayer() {
         getData()
     }, [video_id]);
 
+    useEffect(() => {
+        progress.current = { position: 0, duration: null, sent: 0 };
+
+        // The YouTube embed reports the playback position through postMessage
+        function onMessage(event) {
+            if (!event.origin.includes("youtube")) return;
+
+            let data;
+            try {
+                data = JSON.parse(event.data);
+            } catch {
+                return;
+            }
+
+            if (data.event === "infoDelivery" && data.info) {
+                if (data.info.currentTime != null) progress.current.position = data.info.currentTime;
+                if (data.info.duration) progress.current.duration = data.info.duration;
+            }
+        }
+
+        async function sendHeartbeat() {
+            const { position, duration, sent } = progress.current;
+            if (Math.floor(position) === sent) return;
+
+            progress.current.sent = Math.floor(position);
+            const token = localStorage.getItem("token");
+
+            await fetch(`http://127.0.0.1:5000/videos/${video_id}/progress`, {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                    "Authorization": `Bearer ${token}`
+                },
+                body: JSON.stringify({ position, duration })
+            });
+        }
+
+        window.addEventListener("message", onMessage);
+        const timer = setInterval(sendHeartbeat, 5000);
+
+        return () => {
+            window.removeEventListener("message", onMessage);
+            clearInterval(timer);
+        }
+    }, [video_id]);
+
+    function listenToPlayer() {
+        iframeRef.current.contentWindow.postMessage(JSON.stringify({ event: "listening", id: video_id }), "*");
+    }
+
     if (video == null) {
         return (
             <div className={styles.loadingState}>
@@ -36,8 +88,10 @@ function VideoPlayer() {
         <div className={styles.pageContainer}>
             <div className={styles.videoWrapper}>
                 <iframe 
+                    ref={iframeRef}
                     className={styles.iframe}
-                    src={video.url}
+                    src={`${video.url}${video.url.includes("?") ? "&" : "?"}enablejsapi=1`}
+                    onLoad={listenToPlayer}
                     title={video.title}
                     allowFullScreen 
                 />